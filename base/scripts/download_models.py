@@ -1,36 +1,1926 @@
 #!/usr/bin/env python3
 """
 Enhanced Model Downloader for AiClipse ComfyUI
-Supports HuggingFace Hub, Cloudflare R2, and CivitAI downloads
+Supports HuggingFace Hub, Cloudflare R2, CivitAI and direct URL downloads
 trigger
 """
 
 import argparse
+import contextlib
+import fcntl
+import http.server
 import os
+import shutil
+import socket
 import sys
 import requests
 import hashlib
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urlparse
-from huggingface_hub import hf_hub_download
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from workflow_models import load_workflow_references
+
+
+# Where log() writes; --plan moves it to stderr so stdout stays machine-readable
+LOG_STREAM = sys.stdout
 
 
 def log(message):
-    print(f"[MODELS] {message}", flush=True)
+    print(f"[MODELS] {message}", flush=True, file=LOG_STREAM)
 
 
 def log_error(message):
     print(f"[MODELS ERROR] {message}", flush=True, file=sys.stderr)
 
 
+# Canonical source names used for concurrency limits and summaries
+SOURCE_ALIASES = {
+    "hf": "huggingface",
+    "cloudflare": "r2",
+    "direct": "url",
+}
+
+# Rough sizes (MB) per model folder, used to order downloads when the real
+# size cannot be looked up cheaply (e.g. CivitAI before the API call)
+TYPICAL_SIZES_MB = {
+    "embeddings": 1,
+    "upscale_models": 70,
+    "loras": 200,
+    "vae": 300,
+    "controlnet": 1500,
+    "clip": 5000,
+    "text_encoders": 5000,
+    "checkpoints": 6000,
+    "unet": 12000,
+    "diffusion_models": 12000,
+}
+DEFAULT_TYPICAL_SIZE_MB = 2000
+
+
+def canonical_source(source):
+    return SOURCE_ALIASES.get(source, source)
+
+
+def model_present(path):
+    """True for a real model file; zero-byte files are --lazy placeholders"""
+    try:
+        return os.stat(path).st_size > 0
+    except OSError:
+        return False
+
+
+class DownloadScheduler:
+    """Worker pool with per-source concurrency limits.
+
+    Jobs are dispatched in list order, but a job whose source is already at
+    its limit is passed over in favour of the next job that can run, so one
+    saturated source never idles the whole pool.
+    """
+
+    def __init__(self, workers, source_limits=None):
+        self.workers = max(1, int(workers))
+        self.source_limits = source_limits or {}
+
+    def run(self, jobs, handler):
+        """Call handler(job) for every job; handler must not raise"""
+        pending = list(jobs)
+        active = {}
+        cond = threading.Condition()
+
+        def acquire():
+            with cond:
+                while pending:
+                    for index, job in enumerate(pending):
+                        source = canonical_source(job["source"])
+                        limit = self.source_limits.get(source)
+                        if not limit or active.get(source, 0) < limit:
+                            active[source] = active.get(source, 0) + 1
+                            return pending.pop(index)
+                    cond.wait()
+                return None
+
+        def release(job):
+            with cond:
+                active[canonical_source(job["source"])] -= 1
+                cond.notify_all()
+
+        def worker():
+            while True:
+                job = acquire()
+                if job is None:
+                    return
+                try:
+                    handler(job)
+                finally:
+                    release(job)
+
+        threads = [
+            threading.Thread(target=worker, daemon=True)
+            for _ in range(min(self.workers, len(pending)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # Join with a timeout so Ctrl+C still reaches the main thread
+            while thread.is_alive():
+                thread.join(0.5)
+
+
+class OrderedHasher:
+    """Incremental SHA256 over data written out of order.
+
+    Writers feed (offset, bytes) and return immediately; a background
+    thread hashes the data in file order. Chunks ahead of the hash cursor
+    are held in memory up to max_buffer; anything beyond that budget is
+    only noted and read back from the file (while it is still in the page
+    cache) once the cursor gets there. Regions never fed at all, e.g. parts
+    completed by an earlier attempt, are read back in finalize().
+    """
+
+    def __init__(self, fd=None, max_buffer=256 * 1024 * 1024, read_size=8 * 1024 * 1024):
+        self.fd = fd
+        self.max_buffer = max_buffer
+        self.read_size = read_size
+        self.cursor = 0
+        self._sha = hashlib.sha256()
+        self._pending = {}
+        self._buffered = 0
+        self._spilled = {}
+        self._size = None
+        self._aborted = False
+        self._error = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def feed(self, offset, data):
+        with self._cond:
+            if self._buffered + len(data) <= self.max_buffer:
+                self._pending[offset] = bytes(data)
+                self._buffered += len(data)
+            else:
+                self._spilled[offset] = len(data)
+            self._cond.notify()
+
+    def _next(self):
+        """Wait for the next region to hash; returns (data, end) or None"""
+        with self._cond:
+            while True:
+                if self._aborted:
+                    return None
+                if self.cursor in self._pending:
+                    data = self._pending.pop(self.cursor)
+                    self._buffered -= len(data)
+                    self._cond.notify_all()
+                    return data, self.cursor + len(data)
+                if self.cursor in self._spilled:
+                    return None, self.cursor + self._spilled.pop(self.cursor)
+                if self._size is not None:
+                    if self.cursor >= self._size:
+                        return None
+                    ahead = [o for o in (*self._pending, *self._spilled) if o > self.cursor]
+                    return None, min(ahead, default=self._size)
+                self._cond.wait()
+
+    def _run(self):
+        try:
+            while True:
+                item = self._next()
+                if item is None:
+                    return
+                data, end = item
+                if data is not None:
+                    self._sha.update(data)
+                else:
+                    self._read_back(end)
+                with self._cond:
+                    self.cursor = end
+        except Exception as e:
+            self._error = e
+
+    def _read_back(self, end):
+        if self.fd is None:
+            raise Exception("Cannot hash data that was never fed without a file")
+        position = self.cursor
+        while position < end:
+            data = os.pread(self.fd, min(self.read_size, end - position), position)
+            if not data:
+                raise Exception(f"Unexpected end of file at byte {position:,}")
+            self._sha.update(data)
+            position += len(data)
+
+    def finalize(self, size):
+        """Hash whatever is still outstanding and return the hex digest"""
+        with self._cond:
+            self._size = size
+            self._cond.notify_all()
+        self._thread.join()
+        if self._error:
+            raise self._error
+        return self._sha.hexdigest()
+
+    def abort(self):
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+
+
+class RetryPolicy:
+    """The one place retry and backoff rules live.
+
+    Each request has exactly one retry budget. Metadata requests (API
+    calls, HEAD, the Range probe) are retried by urllib3 inside the pooled
+    session, honouring Retry-After. Streamed body downloads go through
+    stream_session(), which does not retry at all, and are retried by
+    call() instead: it resumes from the last byte written, and applies the
+    same statuses, backoff and Retry-After.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, attempts=3, backoff=1.0, max_delay=60):
+        self.attempts = max(1, int(attempts))
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+    def adapter_retry(self):
+        return Retry(
+            total=self.attempts - 1,
+            backoff_factor=self.backoff,
+            backoff_max=self.max_delay,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+
+    def delay(self, attempt, error=None):
+        delay = min(self.backoff * 2**attempt, self.max_delay)
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            delay = max(delay, min(int(retry_after), self.max_delay))
+        return delay
+
+    def retryable(self, error):
+        response = getattr(error, "response", None)
+        return response is None or response.status_code in self.RETRY_STATUSES
+
+    def call(self, fn, description, on_retry=None):
+        """Run fn(attempt) until it succeeds or attempts run out"""
+        for attempt in range(self.attempts):
+            try:
+                return fn(attempt)
+            except Exception as e:
+                if not self.retryable(e):
+                    raise Exception(f"{description} failed: {e}")
+                if attempt == self.attempts - 1:
+                    raise Exception(f"{description} failed after {self.attempts} attempts: {e}")
+                if on_retry:
+                    on_retry()
+                delay = self.delay(attempt, e)
+                log(f"⚠️ {description} attempt {attempt + 1} failed ({e}), retrying in {delay:g}s...")
+                time.sleep(delay)
+
+
+def build_session(retry_policy, pool_hosts=16, pool_size=64):
+    """Keep-alive session shared by every HTTP source.
+
+    urllib3 keeps one connection pool per host (up to pool_hosts of them,
+    pool_size connections each), so API calls, Range parts and the CDN
+    hosts downloads are redirected to all reuse warm connections.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_hosts,
+        pool_maxsize=pool_size,
+        max_retries=retry_policy.adapter_retry(),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def stream_session(session):
+    """session without adapter retries, for requests RetryPolicy.call()
+    already retries; it shares session's connection pools"""
+    streams = requests.Session()
+    views = {}
+    for prefix, adapter in session.adapters.items():
+        if id(adapter) not in views:
+            view = HTTPAdapter(max_retries=0)
+            view.poolmanager = adapter.poolmanager
+            views[id(adapter)] = view
+        streams.mount(prefix, views[id(adapter)])
+    return streams
+
+
+class TokenBucket:
+    """Thread-safe bytes-per-second limit shared by every caller.
+
+    take(n) reserves n bytes and sleeps off any deficit, so callers are
+    served in the order they asked and connections sharing a bucket get
+    equal shares of it. rate=None means unlimited.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self._lock = threading.Lock()
+        self.rate = None
+        self.burst = 0
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self.rate = float(rate) if rate else None
+            # Up to a second of traffic may go through at full speed
+            self.burst = burst or self.rate or 0
+            self._tokens = min(self._tokens, self.burst)
+            self._stamp = time.monotonic()
+
+    def take(self, nbytes):
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class IoGovernor:
+    """Slows downloads down while something else is using the disk.
+
+    Every periodic write-back reports how long it took per MB. A flush
+    SLOWDOWN times slower than the running baseline means another process
+    (ComfyUI loading a checkpoint from the same volume) is competing for
+    the disk, so the shared write budget is halved; while flushes are back
+    to normal it grows by a quarter per flush until it is lifted again.
+    """
+
+    SLOWDOWN = 3.0
+    MIN_RATE = 8 * 1024 * 1024
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.bucket = TokenBucket()
+        self._baseline = None
+        self._peak = 0.0
+        self._written = 0
+        self._since = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, nbytes):
+        with self._lock:
+            self._written += nbytes
+        self.bucket.take(nbytes)
+
+    def observe(self, nbytes, flush_s):
+        if not self.enabled or nbytes <= 0:
+            return
+        per_mb = flush_s / (nbytes / (1024 * 1024))
+        with self._lock:
+            now = time.monotonic()
+            written_rate = self._written / max(now - self._since, 1e-3)
+            self._written, self._since = 0, now
+            if not self.bucket.rate:
+                self._peak = max(self._peak, written_rate)
+            if self._baseline is None:
+                self._baseline = per_mb
+                return
+
+            # Ignore tiny flushes; their timing is all noise
+            if per_mb > self.SLOWDOWN * self._baseline and flush_s > 0.05:
+                rate = max(self.MIN_RATE, (self.bucket.rate or written_rate) / 2)
+                self.bucket.set_rate(rate)
+                # Let a lasting slowdown become the new normal eventually
+                self._baseline += 0.05 * (per_mb - self._baseline)
+                log(
+                    f"🐢 Disk busy (write-back {flush_s:.1f}s), "
+                    f"limiting downloads to {rate / (1024 * 1024):.0f} MB/s"
+                )
+            else:
+                self._baseline += 0.2 * (per_mb - self._baseline)
+                if self.bucket.rate:
+                    rate = self.bucket.rate * 1.25
+                    if rate >= self._peak:
+                        self.bucket.set_rate(None)
+                        log("🐇 Disk idle again, download write limit lifted")
+                    else:
+                        self.bucket.set_rate(rate)
+
+
+class _WriteBack:
+    """Writes a file back in steps instead of one large fsync at the end.
+
+    Every `step` bytes the data is flushed with fdatasync, timed for the
+    IoGovernor, and with drop_cache the part that has already been hashed
+    is dropped from the page cache (POSIX_FADV_DONTNEED), so gigabytes of
+    cold model data do not push out the pages ComfyUI is reading.
+    """
+
+    def __init__(self, fd, step, drop_cache=False, governor=None, hasher=None, flush=None):
+        self.fd = fd
+        self.step = step
+        self.drop_cache = drop_cache and hasattr(os, "posix_fadvise")
+        self.governor = governor
+        self.hasher = hasher
+        self.flush = flush
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+
+    def wrote(self, nbytes):
+        if not self.step:
+            return
+        with self._lock:
+            self._pending += nbytes
+            if self._pending < self.step:
+                return
+            pending, self._pending = self._pending, 0
+        # One flush at a time; other writers keep going meanwhile
+        if self._flushing.acquire(blocking=False):
+            try:
+                self.sync(pending)
+            finally:
+                self._flushing.release()
+
+    def sync(self, nbytes=0):
+        if self.flush:
+            self.flush()
+        started = time.monotonic()
+        os.fdatasync(self.fd)
+        if self.governor:
+            self.governor.observe(nbytes, time.monotonic() - started)
+        if self.drop_cache:
+            # Bytes past the hash cursor may still have to be read back
+            end = self.hasher.cursor if self.hasher else 0
+            if end or not self.hasher:
+                os.posix_fadvise(self.fd, 0, end, os.POSIX_FADV_DONTNEED)
+
+
+class SegmentedDownloader:
+    """Parallel, resumable HTTP Range downloader.
+
+    Data is written to `<target>.part`, preallocated and split into
+    fixed-size parts; up to `connections` parts are fetched at once and
+    written in place with os.pwrite. How far each part got is recorded in
+    a `<target>.part.json` journal (see _PartJournal) together with the
+    server's validators (ETag, Last-Modified, Content-Length), so an
+    interrupted download only fetches the missing bytes next time. The finished file is renamed into
+    place atomically. Servers that do not answer a Range probe with 206,
+    and files no bigger than one part, use a single streamed GET instead
+    (see _download_single).
+
+    Bytes are fed to an OrderedHasher as they are written, so download()
+    returns the file's SHA256 without a second pass over the file.
+
+    Writes go through the IoGovernor and are flushed every write_back
+    bytes (see _WriteBack), so a download running next to ComfyUI neither
+    piles up dirty pages nor fills the page cache with data nobody reads.
+    """
+
+    def __init__(
+        self,
+        part_size=64 * 1024 * 1024,
+        connections=16,
+        chunk_size=1024 * 1024,
+        timeout=(30, 60),
+        progress_interval=15,
+        hash_buffer=256 * 1024 * 1024,
+        hash_while_downloading=True,
+        session=None,
+        retry_policy=None,
+        write_back=256 * 1024 * 1024,
+        drop_cache=False,
+        governor=None,
+    ):
+        self.part_size = max(1024 * 1024, int(part_size))
+        self.connections = max(1, int(connections))
+        self.chunk_size = max(16 * 1024, int(chunk_size))
+        self.write_back = write_back
+        self.drop_cache = drop_cache
+        self.governor = governor or IoGovernor(enabled=False)
+        self.timeout = timeout
+        self.progress_interval = progress_interval
+        self.hash_buffer = hash_buffer
+        self.hash_while_downloading = hash_while_downloading
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.session = session or build_session(
+            self.retry_policy, pool_size=self.connections * 2
+        )
+        self.streams = stream_session(self.session)
+
+    def probe(self, url, headers=None):
+        """Resolve redirects and return the remote file's size and validators"""
+        probe_headers = dict(headers or {})
+        probe_headers["Range"] = "bytes=0-0"
+        with self.session.get(
+            url, headers=probe_headers, stream=True, timeout=self.timeout
+        ) as r:
+            r.raise_for_status()
+            remote = {
+                "url": r.url,
+                "size": 0,
+                "ranged": False,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+            }
+            if r.status_code == 206:
+                # Drain the one-byte body so the connection goes back to the pool
+                r.content
+                total = r.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+                if total.isdigit():
+                    remote["size"] = int(total)
+                    remote["ranged"] = True
+                    return remote
+            length = r.headers.get("Content-Length")
+            if length and length.isdigit():
+                remote["size"] = int(length)
+            return remote
+
+    def _headers_for(self, url, final_url, headers):
+        # Don't leak credentials to the CDN host a download was redirected to
+        headers = dict(headers or {})
+        if urlparse(url).netloc != urlparse(final_url).netloc:
+            headers.pop("Authorization", None)
+        return headers
+
+    @staticmethod
+    def part_paths(target_file):
+        target_file = Path(target_file)
+        part_file = target_file.with_name(target_file.name + ".part")
+        return part_file, part_file.with_name(part_file.name + ".json")
+
+    def download(
+        self, url, target_file, headers=None, stats=None, on_bytes=None, throttle=None
+    ):
+        """Download url into target_file.
+
+        Returns {"size": bytes, "sha256": hex digest or None}. If a stats
+        dict is passed it receives ttfb_s, bytes (transferred this run),
+        resumed_bytes and retries; on_bytes(n) is called as data arrives.
+        throttle(n) is called before each chunk is read off the socket and
+        may block to enforce bandwidth limits.
+        """
+        stats = stats if stats is not None else {}
+        stats.update({"ttfb_s": None, "bytes": 0, "resumed_bytes": 0, "retries": 0})
+        stats_lock = threading.Lock()
+
+        def count_retry():
+            with stats_lock:
+                stats["retries"] += 1
+
+        target_file = Path(target_file)
+        part_file, journal_file = self.part_paths(target_file)
+        started = time.monotonic()
+        remote = self.probe(url, headers)
+        stats["ttfb_s"] = round(time.monotonic() - started, 3)
+        headers = self._headers_for(url, remote["url"], headers)
+        total_size = remote["size"]
+
+        if not remote["ranged"] or total_size <= self.part_size:
+            sha256 = self._download_single(
+                remote["url"],
+                part_file,
+                headers,
+                total_size,
+                on_bytes,
+                count_retry,
+                throttle,
+                ranged=remote["ranged"],
+            )
+            journal_file.unlink(missing_ok=True)
+            os.replace(part_file, target_file)
+            stats["bytes"] = os.path.getsize(target_file)
+            return {"size": stats["bytes"], "sha256": sha256}
+
+        validators = {
+            "etag": remote["etag"],
+            "last_modified": remote["last_modified"],
+            "content_length": total_size,
+            "part_size": self.part_size,
+        }
+        resumed = _PartJournal.load(journal_file, part_file, validators)
+        parts = [
+            (start, resumed.get(start, start), min(start + self.part_size, total_size) - 1)
+            for start in range(0, total_size, self.part_size)
+        ]
+        missing = [part for part in parts if part[1] <= part[2]]
+        workers = min(self.connections, len(missing)) or 1
+
+        progress = _Progress(target_file.name, total_size, self.progress_interval, on_bytes)
+        progress.done = sum(offset - start for start, offset, _end in parts)
+        stats["resumed_bytes"] = progress.done
+        if resumed:
+            log(
+                f"⏯️ Resuming {target_file.name}: {progress.done:,} bytes already on disk, "
+                f"{len(parts) - len(missing)}/{len(parts)} parts complete"
+            )
+        log(
+            f"⚡ {target_file.name}: {total_size - progress.done:,} bytes in {len(missing)} parts "
+            f"over {workers} connections"
+        )
+
+        flags = os.O_RDWR | os.O_CREAT
+        fd = os.open(part_file, flags, 0o644)
+        sha256 = None
+        hasher = None
+        try:
+            journal = _PartJournal(journal_file, fd, validators, resumed)
+            if not resumed:
+                journal.save()
+                os.ftruncate(fd, 0)
+                self._preallocate(fd, total_size)
+            hasher = (
+                OrderedHasher(fd, self.hash_buffer) if self.hash_while_downloading else None
+            )
+            write_back = _WriteBack(
+                fd, self.write_back, self.drop_cache, self.governor, hasher
+            )
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(
+                        self._fetch_part,
+                        remote["url"],
+                        headers,
+                        fd,
+                        start,
+                        offset,
+                        end,
+                        progress,
+                        journal,
+                        hasher,
+                        count_retry,
+                        throttle,
+                        write_back,
+                    )
+                    for start, offset, end in missing
+                ]
+                for future in futures:
+                    future.result()
+            if hasher:
+                sha256 = hasher.finalize(total_size)
+            write_back.sync()
+            os.fsync(fd)
+        finally:
+            if hasher:
+                hasher.abort()
+            os.close(fd)
+
+        os.replace(part_file, target_file)
+        journal_file.unlink(missing_ok=True)
+        stats["bytes"] = progress.done - stats["resumed_bytes"]
+        return {"size": total_size, "sha256": sha256}
+
+    @staticmethod
+    def _preallocate(fd, size):
+        # Reserve the blocks up front so a full disk fails now, not at 90%
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, size)
+
+    def _fetch_part(
+        self,
+        url,
+        headers,
+        fd,
+        start,
+        offset,
+        end,
+        progress,
+        journal,
+        hasher=None,
+        on_retry=None,
+        throttle=None,
+        write_back=None,
+    ):
+        """Fetch bytes offset..end of the part starting at start"""
+
+        def attempt_part(attempt):
+            nonlocal offset
+            part_headers = dict(headers)
+            part_headers["Range"] = f"bytes={offset}-{end}"
+            with self.streams.get(
+                url, headers=part_headers, stream=True, timeout=self.timeout
+            ) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise Exception(f"Server ignored Range request (HTTP {r.status_code})")
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    if offset + len(chunk) > end + 1:
+                        raise Exception("Server returned more data than requested")
+                    # Blocking here stops reading the socket, so TCP backs
+                    # the sender off instead of data piling up in memory
+                    if throttle:
+                        throttle(len(chunk))
+                    self.governor.take(len(chunk))
+                    os.pwrite(fd, chunk, offset)
+                    if hasher:
+                        hasher.feed(offset, chunk)
+                    offset += len(chunk)
+                    progress.update(len(chunk))
+                    journal.wrote(start, offset)
+                    if write_back:
+                        write_back.wrote(len(chunk))
+            if offset != end + 1:
+                # Next attempt resumes at offset
+                raise Exception(f"Part ended early at byte {offset:,} of {end + 1:,}")
+            journal.checkpoint()
+
+        self.retry_policy.call(attempt_part, f"Part {start:,}-{end:,}", on_retry)
+
+    def _download_single(
+        self,
+        url,
+        part_file,
+        headers,
+        total_size,
+        on_bytes=None,
+        on_retry=None,
+        throttle=None,
+        ranged=False,
+    ):
+        """Stream url into part_file with one GET.
+
+        A retry picks up at the bytes already written when the server takes
+        Range requests (ranged, or Accept-Ranges: bytes on the response);
+        otherwise it starts over and the bytes counted so far are taken
+        back out of progress and on_bytes. Only retries within this call
+        resume: part_file is started afresh each run, so these files are
+        not resumable across restarts like segmented downloads.
+        """
+        progress = _Progress(part_file.name, total_size, self.progress_interval, on_bytes)
+        sha256_hash = hashlib.sha256() if self.hash_while_downloading else None
+        downloaded = 0
+
+        def attempt_download(attempt):
+            nonlocal ranged, sha256_hash, downloaded
+            request_headers = dict(headers)
+            if downloaded and ranged:
+                request_headers["Range"] = f"bytes={downloaded}-"
+            with self.streams.get(
+                url, headers=request_headers, stream=True, timeout=self.timeout
+            ) as r:
+                r.raise_for_status()
+                ranged = ranged or r.headers.get("Accept-Ranges", "").lower() == "bytes"
+                if downloaded and r.status_code != 206:
+                    # Starting over: the bytes sent again are not new progress
+                    log(f"🔄 {part_file.name}: server cannot resume, restarting from byte 0")
+                    progress.update(-downloaded)
+                    sha256_hash = hashlib.sha256() if self.hash_while_downloading else None
+                    downloaded = 0
+                with open(part_file, "r+b" if downloaded else "wb", buffering=self.chunk_size) as f:
+                    # Drop whatever a failed attempt wrote past what was counted
+                    f.truncate(downloaded)
+                    f.seek(downloaded)
+                    # Hashed inline, so everything written may leave the cache
+                    write_back = _WriteBack(
+                        f.fileno(), self.write_back, self.drop_cache, self.governor, flush=f.flush
+                    )
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        if throttle:
+                            throttle(len(chunk))
+                        self.governor.take(len(chunk))
+                        f.write(chunk)
+                        if sha256_hash:
+                            sha256_hash.update(chunk)
+                        downloaded += len(chunk)
+                        progress.update(len(chunk))
+                        write_back.wrote(len(chunk))
+                    write_back.sync()
+                    os.fsync(f.fileno())
+            if total_size and downloaded != total_size:
+                # Next attempt resumes at downloaded if the server allows it
+                raise Exception(f"Got {downloaded:,} of {total_size:,} bytes")
+            return sha256_hash.hexdigest() if sha256_hash else None
+
+        return self.retry_policy.call(
+            attempt_download, f"Download of {part_file.name}", on_retry
+        )
+
+
+class _PartJournal:
+    """Durable per-part progress of a segmented download.
+
+    The journal maps each part's start offset to the offset up to which
+    its bytes are on disk. Progress is only recorded after an fdatasync of
+    the .part file, so a resume after a crash or preemption never trusts
+    bytes that were still dirty in the page cache. A checkpoint is taken
+    when a part completes and otherwise at most every INTERVAL seconds, so
+    a download interrupted part way through its parts resumes each one
+    from where it stopped.
+    """
+
+    INTERVAL = 5
+
+    def __init__(self, journal_file, fd, validators, progress):
+        self.journal_file = journal_file
+        self.fd = fd
+        self.validators = validators
+        self.durable = dict(progress)
+        self._written = dict(progress)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(journal_file, part_file, validators):
+        """{part start: durable offset} if the journal is still valid"""
+        try:
+            with open(journal_file, "r", encoding="utf-8") as f:
+                journal = json.load(f)
+            if (
+                part_file.stat().st_size == validators["content_length"]
+                and all(journal.get(k) == v for k, v in validators.items())
+            ):
+                progress = {int(start): offset for start, offset in journal.get("parts", {}).items()}
+                # Journals written before per-part offsets only list whole parts
+                for start in journal.get("completed", []):
+                    progress[start] = min(start + validators["part_size"], validators["content_length"])
+                return progress
+            log(f"🔄 Remote file changed since last attempt, restarting {part_file.name}")
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def wrote(self, start, offset):
+        with self._lock:
+            self._written[start] = offset
+            due = time.monotonic() - self._last >= self.INTERVAL
+            if due:
+                self._last = time.monotonic()
+        if due:
+            self.checkpoint()
+
+    def checkpoint(self):
+        with self._lock:
+            snapshot = dict(self._written)
+        # Everything in the snapshot was written before this sync
+        os.fdatasync(self.fd)
+        with self._lock:
+            for start, offset in snapshot.items():
+                self.durable[start] = max(self.durable.get(start, start), offset)
+            self.save()
+
+    def save(self):
+        tmp_file = self.journal_file.with_name(self.journal_file.name + ".tmp")
+        parts = {str(start): offset for start, offset in sorted(self.durable.items()) if offset > start}
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(dict(self.validators, parts=parts), f)
+        os.replace(tmp_file, self.journal_file)
+
+
+class _Progress:
+    """Thread-safe byte counter that logs at most every `interval` seconds"""
+
+    def __init__(self, name, total, interval, on_bytes=None):
+        self.name = name
+        self.total = total
+        self.interval = interval
+        self.on_bytes = on_bytes
+        self.done = 0
+        self.started = time.monotonic()
+        self.last_log = self.started
+        self._lock = threading.Lock()
+
+    def update(self, nbytes):
+        if self.on_bytes:
+            self.on_bytes(nbytes)
+        with self._lock:
+            self.done += nbytes
+            now = time.monotonic()
+            if now - self.last_log < self.interval:
+                return
+            self.last_log = now
+            rate = self.done / max(now - self.started, 1e-6) / (1024 * 1024)
+            if self.total:
+                percent = self.done / self.total * 100
+                log(f"📥 {self.name}: {percent:.1f}% ({self.done:,}/{self.total:,} bytes, {rate:.1f} MB/s)")
+            else:
+                log(f"📥 {self.name}: {self.done:,} bytes ({rate:.1f} MB/s)")
+
+
+class ChecksumCache:
+    """Persistent SHA256 cache so unchanged models are not re-hashed on boot.
+
+    Entries are keyed by absolute path and only trusted while the file's
+    size, mtime and inode still match what was recorded when it was hashed.
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = Path(cache_file)
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _fingerprint(path):
+        st = os.stat(path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+    def get(self, path):
+        """Return the cached digest, or None if missing or stale"""
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry:
+            return None
+        try:
+            fingerprint = self._fingerprint(path)
+        except OSError:
+            return None
+        if all(entry.get(k) == v for k, v in fingerprint.items()):
+            return entry["sha256"]
+        return None
+
+    def find(self, sha256):
+        """A file whose cached (and still valid) digest is sha256, or None"""
+        sha256 = sha256.lower()
+        with self._lock:
+            paths = [path for path, entry in self._entries.items() if entry.get("sha256") == sha256]
+        for path in paths:
+            if self.get(path) == sha256:
+                return path
+        return None
+
+    def put(self, path, sha256):
+        entry = dict(self._fingerprint(path), sha256=sha256.lower())
+        with self._lock:
+            self._entries[os.path.abspath(path)] = entry
+            self._save()
+
+    def _save(self):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=1)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            log_error(f"Could not save checksum cache: {e}")
+
+
+def hash_file(file_path, buffer_size=8 * 1024 * 1024):
+    """SHA256 of a file using large buffers (hashlib releases the GIL)"""
+    sha256_hash = hashlib.sha256()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            sha256_hash.update(view[:n])
+    return sha256_hash.hexdigest()
+
+
+class MetadataCache:
+    """Persistent JSON cache of API responses with a time-to-live"""
+
+    def __init__(self, cache_file, ttl):
+        self.cache_file = Path(cache_file)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(str(key))
+        if entry and time.time() - entry["fetched_at"] < self.ttl:
+            return entry["value"]
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[str(key)] = {"fetched_at": time.time(), "value": value}
+            try:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_file, self.cache_file)
+            except OSError as e:
+                log_error(f"Could not save {self.cache_file.name}: {e}")
+
+
+def civitai_file_index(model_data):
+    """Index a CivitAI model's files for the manifest match strategies.
+
+    Versions are listed newest first and the first match wins, as with the
+    original linear scan: exact name, first primary file ('auto'/'latest'),
+    and every dotted suffix of each name ('.safetensors', '.fp16.safetensors').
+    """
+    index = {"names": {}, "primary": None, "suffixes": {}}
+    for version in model_data.get("modelVersions", []):
+        for file in version.get("files", []):
+            name = file.get("name", "")
+            index["names"].setdefault(name, file)
+            if file.get("primary", False) and index["primary"] is None:
+                index["primary"] = file
+            dot = name.find(".")
+            while dot != -1:
+                index["suffixes"].setdefault(name[dot:], file)
+                dot = name.find(".", dot + 1)
+    return index
+
+
+def _trim_civitai_model(model_data):
+    """Keep only the fields the downloader uses, so the cache stays small"""
+    return {
+        "modelVersions": [
+            {
+                "id": version.get("id"),
+                "modelId": version.get("modelId"),
+                "name": version.get("name"),
+                "files": [
+                    {
+                        "name": file.get("name"),
+                        "downloadUrl": file.get("downloadUrl"),
+                        "sizeKB": file.get("sizeKB"),
+                        "primary": file.get("primary", False),
+                        "hashes": {"SHA256": (file.get("hashes") or {}).get("SHA256")},
+                    }
+                    for file in version.get("files", [])
+                ],
+            }
+            for version in model_data.get("modelVersions", [])
+        ]
+    }
+
+
+class ModelStore:
+    """Content-addressed blob store keyed by SHA256.
+
+    Blobs live under <root>/sha256/<first two hex chars>/<digest> and the
+    paths ComfyUI reads are hardlinks to them (symlinks when a hardlink is
+    not possible), so identical weights under different names, subdirs or
+    templates take the space of one file. Models are treated as immutable:
+    editing a linked file in place would change the blob too.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def blob_path(self, digest):
+        digest = digest.lower()
+        return self.root / "sha256" / digest[:2] / digest
+
+    def has(self, digest):
+        return self.blob_path(digest).is_file()
+
+    def link_into(self, digest, target_file):
+        """Materialize target_file from the store; returns False if absent"""
+        blob = self.blob_path(digest)
+        if not blob.is_file():
+            return False
+        target_file = Path(target_file)
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        self._replace_with_link(blob, target_file)
+        return True
+
+    def ingest(self, file_path, digest):
+        """Add a verified file to the store, deduplicating against an
+        existing blob. Returns True if file_path now shares the blob."""
+        file_path = Path(file_path)
+        blob = self.blob_path(digest)
+        try:
+            if not blob.exists():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.link(file_path, blob)
+                return True
+            if os.path.samefile(file_path, blob):
+                return False
+            self._replace_with_link(blob, file_path)
+            return True
+        except OSError as e:
+            log_error(f"Model store: could not ingest {file_path.name}: {e}")
+            return False
+
+    @staticmethod
+    def _replace_with_link(blob, target_file):
+        tmp_file = target_file.with_name(f".{target_file.name}.link")
+        tmp_file.unlink(missing_ok=True)
+        try:
+            os.link(blob, tmp_file)
+        except OSError:
+            # Different filesystem or no hardlink support
+            os.symlink(os.path.relpath(blob, target_file.parent), tmp_file)
+        os.replace(tmp_file, target_file)
+
+
+@contextlib.contextmanager
+def locked_json(path, **dump_args):
+    """Read-modify-write a JSON state file shared between processes.
+
+    download_models.py and the lazy_models.py daemon update the same
+    indexes. An flock on <path>.lock serializes them and the file is read
+    again under the lock, so each writer merges its change into the latest
+    copy instead of overwriting another process's update with a stale one.
+    Yields the loaded dict; it is written back atomically on exit.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                data = {}
+        except (OSError, ValueError):
+            data = {}
+        yield data
+        tmp_file = path.with_name(path.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_args)
+        os.replace(tmp_file, path)
+
+
+class LazyIndex:
+    """Registry of manifest entries deferred by --lazy.
+
+    Each deferred model gets a zero-byte placeholder at its target path so
+    it still shows up in ComfyUI, plus an entry here (keyed "subdir/filename")
+    with everything lazy_models.py needs to fetch it on first use.
+    """
+
+    MANIFEST_FIELDS = ("source", "identifier", "filename", "subdir", "checksum", "line_num")
+    # Usage is recorded by lazy_models.py; re-registering keeps it
+    USAGE_FIELDS = ("fetched_at", "last_used", "uses")
+
+    def __init__(self, index_file):
+        self.index_file = Path(index_file)
+        self._lock = threading.Lock()
+        self.models = {}
+        # key -> ("replace", entry) | ("update", fields) | ("forget", None),
+        # merged into the file on the next save
+        self._changes = {}
+        self._mtime = None
+        self._refresh()
+
+    def _refresh(self):
+        """Pick up changes the other process saved; caller holds no lock"""
+        try:
+            mtime = os.stat(self.index_file).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                models = json.load(f).get("models", {})
+        except (OSError, ValueError, AttributeError):
+            return
+        with self._lock:
+            self._mtime = mtime
+            self.models = self._merged(models)
+
+    @staticmethod
+    def key(model_info, target_file):
+        return f"{model_info['subdir']}/{Path(target_file).name}"
+
+    def register(self, model_info, target_file, state="deferred"):
+        """Record a lazily managed entry; deferred ones get a placeholder"""
+        target_file = Path(target_file)
+        key = self.key(model_info, target_file)
+        entry = {field: model_info[field] for field in self.MANIFEST_FIELDS}
+        entry.update(
+            name=target_file.name,
+            target=str(target_file),
+            size=model_info.get("size"),
+            state=state,
+        )
+        if state == "deferred" and not target_file.exists():
+            target_file.parent.mkdir(parents=True, exist_ok=True)
+            target_file.touch()
+        with self._lock:
+            self._changes[key] = ("replace", entry)
+            self.models = self._merged(self.models, [key])
+
+    def forget(self, key):
+        """Drop an entry, removing its placeholder if one is left"""
+        with self._lock:
+            entry = self.models.get(key)
+            self._changes[key] = ("forget", None)
+            self.models = self._merged(self.models, [key])
+        if entry and not model_present(entry["target"]):
+            Path(entry["target"]).unlink(missing_ok=True)
+
+    def lookup(self, name):
+        """Entry key for "subdir/filename" or a bare filename, else None"""
+        self._refresh()
+        with self._lock:
+            if name in self.models:
+                return name
+            matches = [key for key, entry in self.models.items() if entry["name"] == name]
+        return matches[0] if len(matches) == 1 else None
+
+    def key_for_path(self, path):
+        self._refresh()
+        path = os.path.abspath(path)
+        with self._lock:
+            for key, entry in self.models.items():
+                if os.path.abspath(entry["target"]) == path:
+                    return key
+        return None
+
+    def update(self, key, **fields):
+        with self._lock:
+            kind, pending = self._changes.get(key, ("update", {}))
+            if kind == "forget":
+                return
+            self._changes[key] = (kind, dict(pending or {}, **fields))
+            self.models = self._merged(self.models, [key])
+            self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _merged(self, models, keys=None):
+        """models with the pending changes (for keys, default all) applied"""
+        models = dict(models)
+        for key in self._changes if keys is None else keys:
+            kind, fields = self._changes[key]
+            if kind == "forget":
+                models.pop(key, None)
+            elif kind == "replace":
+                previous = models.get(key, {})
+                entry = dict(fields)
+                for field in self.USAGE_FIELDS:
+                    if field in previous and field not in entry:
+                        entry[field] = previous[field]
+                models[key] = entry
+            elif key in models:
+                models[key] = dict(models[key], **fields)
+        return models
+
+    def _save(self):
+        try:
+            with locked_json(self.index_file, indent=1) as data:
+                data["models"] = self._merged(data.get("models", {}))
+                self.models = data["models"]
+            self._changes = {}
+            self._mtime = os.stat(self.index_file).st_mtime_ns
+        except OSError as e:
+            log_error(f"Could not save lazy index: {e}")
+
+
+class ModelCache:
+    """Byte budget and free-space guard for the models volume.
+
+    Files this downloader put on disk are tracked in a compact index
+    (<state-dir>/model_cache.json: path -> [size, last_used, uses]). When a
+    transfer would exceed the budget or the free space, the least recently
+    (lru) or least frequently (lfu) used ones that the active manifest does
+    not pin are evicted first. Files the index does not know about, such as
+    user uploads, count towards usage but are never deleted. Hardlinked
+    copies are evicted together with their model store blob, since only
+    then is the space actually returned.
+    """
+
+    HEADROOM = 1024**3
+
+    def __init__(
+        self, models_dir, index_file, budget_bytes=None, policy="lru", evict=True, lazy_index=None
+    ):
+        self.models_dir = Path(models_dir)
+        self.index_file = Path(index_file)
+        self.budget = budget_bytes
+        self.evict = evict
+        self.policy = policy
+        self.lazy_index = lazy_index
+        self._lock = threading.Lock()
+        self._reserved = {}
+        self.files = {}
+        self.pinned = set()
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.pinned = set(data.get("pinned", []))
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.models_dir.resolve())
+
+    def pin(self, paths):
+        """Replace the pinned set with the active manifest's targets"""
+        pinned = {self._key(path) for path in paths}
+        with self._lock:
+            self._update(lambda files: pinned)
+
+    def record(self, path, used=True):
+        """Track a file; used=False only registers it (e.g. found on boot)"""
+        key = self._key(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        def change(files):
+            size, last_used, uses = files.get(key, [0, max(st.st_atime, st.st_mtime), 0])
+            if used:
+                last_used, uses = time.time(), uses + 1
+            files[key] = [st.st_size, round(last_used), uses]
+
+        with self._lock:
+            self._update(change)
+
+    def touch(self, path):
+        if self._key(path) in self.files:
+            self.record(path)
+
+    def reserve(self, target_file, nbytes):
+        """Make room for nbytes before a transfer; raises if impossible.
+
+        Transfers still in flight hold their own reservations, so the space
+        they have yet to write is counted as used: parallel downloads cannot
+        each see the same free space and overcommit the disk together.
+        """
+        target_key = self._key(target_file)
+        with self._lock:
+            self._reserved[target_key] = (Path(target_file), nbytes or 0)
+            if not nbytes:
+                return
+            # A resumed transfer already holds the blocks its .part allocated
+            needed = max(0, nbytes - self._allocated(target_file))
+            pending = self._pending(exclude=target_key)
+            free = shutil.disk_usage(self.models_dir).free - pending
+            deficit = needed + self.HEADROOM - free
+            if self.budget:
+                # .part files are left out of the scan; every transfer in
+                # flight counts at its full size instead
+                usage = sum(group["size"] for group in self._scan().values())
+                usage += sum(size for key, (_, size) in self._reserved.items() if key != target_key)
+                deficit = max(deficit, usage + nbytes - self.budget)
+            if deficit > 0 and self.evict:
+                self._evict(deficit)
+
+            free = shutil.disk_usage(self.models_dir).free - pending
+            if needed + self.HEADROOM > free:
+                del self._reserved[target_key]
+                raise OSError(
+                    f"Not enough disk space for {Path(target_file).name}: "
+                    f"needs {needed / 1024**3:.1f} GB, {max(free, 0) / 1024**3:.1f} GB free "
+                    f"after {pending / 1024**3:.1f} GB of downloads in progress"
+                )
+
+    @staticmethod
+    def _allocated(target_file):
+        """Bytes on disk for target_file's .part"""
+        target_file = Path(target_file)
+        # Allocated blocks, not st_size: segmented .part files are sparse
+        try:
+            return os.stat(target_file.with_name(target_file.name + ".part")).st_blocks * 512
+        except OSError:
+            return 0
+
+    def _pending(self, exclude=None):
+        """Bytes reserved transfers have yet to write; caller holds _lock"""
+        pending = 0
+        for key, (target_file, nbytes) in self._reserved.items():
+            if key == exclude or not nbytes:
+                continue
+            pending += max(0, nbytes - self._allocated(target_file))
+        return pending
+
+    def release(self, target_file):
+        """Drop the reservation once the transfer finished or failed"""
+        with self._lock:
+            self._reserved.pop(self._key(target_file), None)
+
+    def _scan(self):
+        """(st_dev, st_ino) -> {"size", "paths", "blobs"}; hardlinks and
+        symlinks into the store share one entry, .part files are skipped"""
+        groups = {}
+        store_dir = self.models_dir / ".store"
+        for root, _dirs, files in os.walk(self.models_dir):
+            in_store = Path(root) == store_dir or store_dir in Path(root).parents
+            for name in files:
+                if name.endswith(".part"):
+                    # In-flight transfers are counted through _reserved
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                group = groups.setdefault(
+                    (st.st_dev, st.st_ino), {"size": st.st_size, "paths": [], "blobs": []}
+                )
+                group["blobs" if in_store else "paths"].append(path)
+        return groups
+
+    def _evict(self, nbytes):
+        """Free at least nbytes from unpinned, tracked files; caller holds _lock"""
+        # Rank by the latest usage, including what lazy_models.py recorded
+        self._update(lambda files: None)
+        candidates = []
+        for group in self._scan().values():
+            keys = [self._key(path) for path in group["paths"]]
+            if not keys:
+                # Store blob nothing links to any more
+                candidates.append((-1, 0, group, keys))
+                continue
+            if any(
+                key not in self.files or key in self.pinned or key in self._reserved
+                for key in keys
+            ):
+                continue
+            if not group["size"]:
+                continue
+            last_used = max(self.files[key][1] for key in keys)
+            uses = sum(self.files[key][2] for key in keys)
+            rank = (uses, last_used) if self.policy == "lfu" else (last_used, uses)
+            candidates.append((*rank, group, keys))
+
+        freed = 0
+        evicted = []
+        for *_rank, group, keys in sorted(candidates, key=lambda c: c[:2]):
+            if freed >= nbytes:
+                break
+            for path, key in zip(group["paths"], keys):
+                self._evict_path(path, key)
+                evicted.append(key)
+            for blob in group["blobs"]:
+                Path(blob).unlink(missing_ok=True)
+            freed += group["size"]
+            label = ", ".join(keys) or "orphaned store blob"
+            log(f"🧹 Evicted {label} ({group['size'] / 1024**3:.2f} GB, {self.policy})")
+
+        def forget(files):
+            for key in evicted:
+                files.pop(key, None)
+
+        self._update(forget)
+        if freed < nbytes:
+            log(
+                f"⚠️ Model cache: only {freed / 1024**3:.1f} of {nbytes / 1024**3:.1f} GB "
+                f"could be evicted (the rest is pinned or untracked)"
+            )
+        return freed
+
+    def _evict_path(self, path, key):
+        Path(path).unlink(missing_ok=True)
+        lazy_key = self.lazy_index.key_for_path(path) if self.lazy_index else None
+        if lazy_key:
+            # Back to a placeholder, so lazy_models.py can fetch it again
+            Path(path).touch()
+            self.lazy_index.update(lazy_key, state="deferred")
+
+    def _update(self, change):
+        """Apply change(files) to the index file under its file lock and
+        refresh the in-memory copy; change may return a new pinned set.
+        Caller holds _lock."""
+        try:
+            with locked_json(self.index_file, separators=(",", ":")) as data:
+                files = data.setdefault("files", {})
+                pinned = change(files)
+                if pinned is not None:
+                    data["pinned"] = sorted(pinned)
+                data.setdefault("pinned", [])
+            self.files, self.pinned = files, set(data["pinned"])
+        except OSError as e:
+            log_error(f"Could not save model cache index: {e}")
+
+
+class DownloadTelemetry:
+    """Per-file and aggregate download metrics.
+
+    Every finished file (and a final summary) is emitted as a JSON line to
+    a file or a udp://host:port / tcp://host:port socket. Optionally the
+    same counters are served in Prometheus text format on
+    http://0.0.0.0:<port>/metrics while the run is in progress.
+    """
+
+    PHASES = ("queue_wait_s", "resolve_s", "transfer_s", "verify_s")
+
+    def __init__(self, sink=None, metrics_port=None):
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.sources = {}
+        self.in_progress = 0
+        self.metrics_port = metrics_port
+        self._sink_spec = sink
+        self._socket = None
+        if sink and "://" in sink:
+            self._connect(sink)
+
+    def _connect(self, sink):
+        scheme, address = sink.split("://", 1)
+        host, port = address.rsplit(":", 1)
+        try:
+            kind = socket.SOCK_DGRAM if scheme == "udp" else socket.SOCK_STREAM
+            self._socket = socket.socket(socket.AF_INET, kind)
+            self._socket.connect((host, int(port)))
+        except OSError as e:
+            log_error(f"Metrics sink {sink} unavailable: {e}")
+            self._socket = None
+            self._sink_spec = None
+
+    def _totals(self, source):
+        return self.sources.setdefault(
+            source,
+            dict(
+                {"files": 0, "failed": 0, "bytes": 0, "live_bytes": 0, "retries": 0},
+                **{phase: 0.0 for phase in self.PHASES},
+            ),
+        )
+
+    def emit(self, event, **fields):
+        if not self._sink_spec:
+            return
+        line = json.dumps(dict({"ts": round(time.time(), 3), "event": event}, **fields)) + "\n"
+        try:
+            if self._socket:
+                self._socket.sendall(line.encode())
+            else:
+                Path(self._sink_spec).parent.mkdir(parents=True, exist_ok=True)
+                with open(self._sink_spec, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            log_error(f"Metrics sink write failed, disabling: {e}")
+            self._sink_spec = None
+
+    def add_bytes(self, source, nbytes):
+        with self._lock:
+            self._totals(source)["live_bytes"] += nbytes
+
+    def file_started(self):
+        with self._lock:
+            self.in_progress += 1
+
+    def file_done(self, model_info, status, error=None):
+        source = canonical_source(model_info["source"])
+        stats = model_info.get("stats", {})
+        transfer_s = stats.get("transfer_s") or 0
+        record = {
+            "file": model_info.get("resolved", {}).get("filename") or model_info["filename"],
+            "subdir": model_info["subdir"],
+            "source": source,
+            "status": status,
+            "bytes": stats.get("bytes", 0),
+            "resumed_bytes": stats.get("resumed_bytes", 0),
+            "bytes_per_s": round(stats.get("bytes", 0) / transfer_s) if transfer_s else None,
+            "ttfb_s": stats.get("ttfb_s"),
+            "retries": stats.get("retries", 0),
+        }
+        record.update({phase: round(stats.get(phase) or 0, 3) for phase in self.PHASES})
+        if stats.get("peer"):
+            record["peer"] = stats["peer"]
+        if error:
+            record["error"] = str(error)
+        with self._lock:
+            self.in_progress -= 1
+            totals = self._totals(source)
+            totals["files"] += 1
+            totals["failed"] += status == "failed"
+            totals["bytes"] += record["bytes"]
+            totals["retries"] += record["retries"]
+            for phase in self.PHASES:
+                totals[phase] += record[phase]
+        self.emit("file", **record)
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        with self._lock:
+            sources = {
+                source: {k: round(v, 3) for k, v in totals.items()}
+                for source, totals in self.sources.items()
+            }
+        total_bytes = sum(t["bytes"] for t in sources.values())
+        self.emit(
+            "summary",
+            elapsed_s=round(elapsed, 3),
+            bytes=total_bytes,
+            bytes_per_s=round(total_bytes / elapsed) if elapsed else None,
+            sources=sources,
+        )
+
+        log(
+            f"⏱️ {total_bytes / 1024**3:.2f} GB in {elapsed:.1f}s "
+            f"({total_bytes / max(elapsed, 1e-6) / 1024**2:.1f} MB/s aggregate)"
+        )
+        for source, t in sorted(sources.items()):
+            phases = ", ".join(f"{p[:-2]} {t[p]:.1f}s" for p in self.PHASES)
+            log(
+                f"   {source}: {t['files']} files, {t['bytes'] / 1024**2:,.0f} MB, "
+                f"{t['retries']} retries, {t['failed']} failed ({phases})"
+            )
+
+    def prometheus_text(self):
+        with self._lock:
+            sources = {k: dict(v) for k, v in self.sources.items()}
+            in_progress = self.in_progress
+        lines = [
+            "# TYPE aiclipse_download_bytes_total counter",
+            *(f'aiclipse_download_bytes_total{{source="{s}"}} {t["live_bytes"]}' for s, t in sources.items()),
+            "# TYPE aiclipse_download_files_total counter",
+            *(f'aiclipse_download_files_total{{source="{s}"}} {t["files"]}' for s, t in sources.items()),
+            "# TYPE aiclipse_download_failures_total counter",
+            *(f'aiclipse_download_failures_total{{source="{s}"}} {t["failed"]}' for s, t in sources.items()),
+            "# TYPE aiclipse_download_retries_total counter",
+            *(f'aiclipse_download_retries_total{{source="{s}"}} {t["retries"]}' for s, t in sources.items()),
+            "# TYPE aiclipse_download_phase_seconds_total counter",
+            *(
+                f'aiclipse_download_phase_seconds_total{{source="{s}",phase="{p[:-2]}"}} {t[p]:.3f}'
+                for s, t in sources.items()
+                for p in self.PHASES
+            ),
+            "# TYPE aiclipse_download_in_progress gauge",
+            f"aiclipse_download_in_progress {in_progress}",
+            "# TYPE aiclipse_download_elapsed_seconds gauge",
+            f"aiclipse_download_elapsed_seconds {time.monotonic() - self.started:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self):
+        """Start the /metrics endpoint if a port is configured"""
+        if not self.metrics_port:
+            return
+        telemetry = self
+        port = self.metrics_port
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        try:
+            server = http.server.ThreadingHTTPServer(("0.0.0.0", int(port)), MetricsHandler)
+        except OSError as e:
+            log_error(f"Metrics endpoint on port {port} unavailable: {e}")
+            return
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        log(f"📈 Metrics at http://0.0.0.0:{port}/metrics")
+
+
+class WorkflowReadiness:
+    """Tracks which workflows have every model they load on disk.
+
+    A workflow is ready once each file it references is either a manifest
+    entry that finished in this run or, if the manifest does not list it,
+    already present under the models dir. Ready workflows get a marker at
+    <state-dir>/ready/<workflow>.ready, and <state-dir>/workflow_status.json
+    lists what each workflow is still waiting for.
+    """
+
+    def __init__(self, workflows, manifest, models_dir, state_dir, telemetry=None):
+        self.workflows = workflows
+        self.ready_dir = Path(state_dir) / "ready"
+        self.status_file = Path(state_dir) / "workflow_status.json"
+        self.telemetry = telemetry
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+        # filename -> manifest entries still outstanding; several subdirs
+        # may hold a file of the same name, each one counts
+        self.pending = {}
+        manifest_sizes = {}
+        for name, remaining in manifest:
+            self.pending[name] = self.pending.get(name, 0) + 1
+            manifest_sizes[name] = manifest_sizes.get(name, 0) + remaining
+        self.failed = set()
+        self.ready_at = {}
+
+        referenced = set().union(*workflows.values()) if workflows else set()
+        unlisted = referenced - set(self.pending)
+        on_disk = set()
+        if unlisted:
+            for _root, _dirs, files in os.walk(models_dir):
+                on_disk.update(unlisted.intersection(files))
+        self.unavailable = unlisted - on_disk
+
+        # Workflows that can become ready go first, cheapest to finish first
+        def remaining(name):
+            refs = workflows[name]
+            return (
+                bool(refs & self.unavailable),
+                sum(manifest_sizes.get(ref, 0) for ref in refs),
+                name,
+            )
+
+        self.order = {name: rank for rank, name in enumerate(sorted(workflows, key=remaining))}
+
+    def rank(self, filename):
+        """Priority of a manifest entry: its earliest workflow, else last"""
+        ranks = [self.order[name] for name, refs in self.workflows.items() if filename in refs]
+        return min(ranks, default=len(self.order))
+
+    def start(self):
+        self.ready_dir.mkdir(parents=True, exist_ok=True)
+        for name in self.workflows:
+            (self.ready_dir / f"{name}.ready").unlink(missing_ok=True)
+        for name, refs in self.workflows.items():
+            if refs & self.unavailable:
+                log(
+                    f"⚠️ Workflow {name} needs models not in the manifest: "
+                    f"{', '.join(sorted(refs & self.unavailable))}"
+                )
+        with self._lock:
+            self._update(self.workflows)
+
+    def file_done(self, filename, ok):
+        with self._lock:
+            if filename in self.pending:
+                self.pending[filename] = max(0, self.pending[filename] - 1)
+            if not ok:
+                self.failed.add(filename)
+            self._update([name for name, refs in self.workflows.items() if filename in refs])
+
+    def _waiting(self, refs):
+        return sorted(ref for ref in refs if self.pending.get(ref))
+
+    def _update(self, names):
+        for name in names:
+            refs = self.workflows[name]
+            if name in self.ready_at or self._waiting(refs):
+                continue
+            if refs & (self.unavailable | self.failed):
+                continue
+            elapsed = time.monotonic() - self.started
+            self.ready_at[name] = time.time()
+            with open(self.ready_dir / f"{name}.ready", "w", encoding="utf-8") as f:
+                json.dump({"workflow": name, "models": sorted(refs)}, f, indent=2)
+            log(f"🟢 Workflow ready: {name} ({len(refs)} models, {elapsed:.1f}s)")
+            if self.telemetry:
+                self.telemetry.emit("workflow_ready", workflow=name, elapsed_s=round(elapsed, 3))
+
+        status = {
+            name: {
+                "ready": name in self.ready_at,
+                "ready_at": self.ready_at.get(name),
+                "models": sorted(refs),
+                "waiting": self._waiting(refs),
+                "failed": sorted(refs & self.failed),
+                "unavailable": sorted(refs & self.unavailable),
+            }
+            for name, refs in self.workflows.items()
+        }
+        tmp_file = self.status_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp_file, self.status_file)
+
+
 class EnhancedModelDownloader:
-    def __init__(self, models_dir, hf_token=None, r2_config=None, civitai_token=None):
+    def __init__(
+        self,
+        models_dir,
+        hf_token=None,
+        r2_config=None,
+        civitai_token=None,
+        hf_endpoint="https://huggingface.co",
+        civitai_api="https://civitai.com/api/v1",
+        civitai_cache_ttl=24 * 3600,
+        validate_cache_ttl=3600,
+        workers=4,
+        source_limits=None,
+        part_size_mb=64,
+        connections=16,
+        http_pool_hosts=16,
+        http_pool_size=None,
+        http_retries=3,
+        http_backoff=1.0,
+        state_dir=None,
+        hash_workers=2,
+        use_store=True,
+        metrics_sink=None,
+        metrics_port=None,
+        workflows=None,
+        lazy=False,
+        cache_budget_gb=None,
+        cache_policy="lru",
+        peers=None,
+        changes=None,
+        lockfile=None,
+        max_mbps=None,
+        source_max_mbps=None,
+        write_buffer_kb=1024,
+        write_back_mb=256,
+        drop_cache=True,
+        adaptive_io=True,
+    ):
         self.models_dir = Path(models_dir)
         self.models_dir.mkdir(parents=True, exist_ok=True)
+        # Persistent bookkeeping (caches, journals) lives next to the models
+        # dir, i.e. /workspace/aiclipse in the container
+        self.state_dir = Path(state_dir) if state_dir else self.models_dir.parent
         self.hf_token = hf_token
+        self.hf_endpoint = hf_endpoint.rstrip("/")
         self.civitai_token = civitai_token
+        self.civitai_api = civitai_api.rstrip("/")
+        self.workers = workers
+        self.source_limits = source_limits or {}
+        self.retry_policy = RetryPolicy(attempts=http_retries, backoff=http_backoff)
+        self.session = build_session(
+            self.retry_policy,
+            pool_hosts=http_pool_hosts,
+            pool_size=http_pool_size or max(16, workers * connections),
+        )
+        # Bandwidth caps in MB/s: one for all transfers plus one per source
+        self.bandwidth = TokenBucket(max_mbps * 1024 * 1024 if max_mbps else None)
+        self.source_bandwidth = {
+            source: TokenBucket(mbps * 1024 * 1024)
+            for source, mbps in (source_max_mbps or {}).items()
+            if mbps
+        }
+        self.engine = SegmentedDownloader(
+            part_size=part_size_mb * 1024 * 1024,
+            connections=connections,
+            chunk_size=write_buffer_kb * 1024,
+            session=self.session,
+            retry_policy=self.retry_policy,
+            write_back=write_back_mb * 1024 * 1024,
+            drop_cache=drop_cache,
+            governor=IoGovernor(enabled=adaptive_io and write_back_mb > 0),
+        )
+
+        self.checksum_cache = ChecksumCache(self.state_dir / "checksum_cache.json")
+        if metrics_sink is None:
+            metrics_sink = str(self.state_dir / "logs" / "models_metrics.jsonl")
+        elif metrics_sink.lower() in ("", "off", "false"):
+            metrics_sink = None
+        self.telemetry = DownloadTelemetry(metrics_sink, metrics_port)
+        self.workflow_paths = workflows or []
+        # --locked: resolutions pinned by an earlier --write-lock run
+        self.lock_entries = {}
+        if lockfile:
+            try:
+                with open(lockfile, "r", encoding="utf-8") as f:
+                    self.lock_entries = json.load(f).get("entries", {})
+            except FileNotFoundError:
+                log(f"🔓 Lockfile {lockfile} not found, resolving every entry")
+            except (OSError, ValueError, AttributeError) as e:
+                log_error(f"Ignoring lockfile {lockfile}: {e}")
+
+        # manifest_merge.py report: entries whose source changed since the
+        # file on disk was fetched
+        self.updated_entries = set()
+        if changes:
+            try:
+                with open(changes, "r", encoding="utf-8") as f:
+                    self.updated_entries = set(json.load(f).get("updated", []))
+            except (OSError, ValueError, AttributeError) as e:
+                log_error(f"Ignoring manifest changes file {changes}: {e}")
+        self.lazy = lazy
+        self.lazy_index = LazyIndex(self.state_dir / "lazy_index.json")
+        # Other pods (or a mirror) serving /sha256/<digest>, tried before upstream
+        self.peers = [peer.rstrip("/") for peer in peers or []]
+        self._dead_peers = set()
+        self.cache = ModelCache(
+            self.models_dir,
+            self.state_dir / "model_cache.json",
+            budget_bytes=int(cache_budget_gb * 1024**3) if cache_budget_gb else None,
+            policy=cache_policy,
+            evict=cache_budget_gb is not None,
+            lazy_index=self.lazy_index,
+        )
+        self.store = ModelStore(self.models_dir / ".store") if use_store else None
+        self.civitai_cache = MetadataCache(
+            self.state_dir / "civitai_cache.json", civitai_cache_ttl
+        )
+        self._civitai_indexes = {}
+        self.validate_cache = MetadataCache(
+            self.state_dir / "validate_cache.json", validate_cache_ttl
+        )
+        # Hashing runs on its own pool so verifying existing files overlaps
+        # with downloads instead of occupying download slots
+        self.hash_pool = ThreadPoolExecutor(max_workers=max(1, hash_workers))
+        self._hash_futures = {}
+        self._hash_futures_lock = threading.Lock()
+
+        # Serializes concurrent jobs that target the same file or blob
+        self._target_locks = {}
+        self._target_locks_guard = threading.Lock()
 
         # Initialize R2 client if configured
         self.r2_client = None
@@ -45,7 +1935,8 @@ class EnhancedModelDownloader:
 
             self.r2_client = boto3.client(
                 "s3",
-                endpoint_url=f"https://{r2_config['account_id']}.r2.cloudflarestorage.com",
+                endpoint_url=r2_config.get("endpoint")
+                or f"https://{r2_config['account_id']}.r2.cloudflarestorage.com",
                 aws_access_key_id=r2_config["access_key"],
                 aws_secret_access_key=r2_config["secret_key"],
                 region_name="auto",
@@ -69,7 +1960,7 @@ class EnhancedModelDownloader:
         first_part = parts[0].strip().lower()
 
         # Enhanced format: source|identifier|filename|subdir[|checksum]
-        if first_part in ["r2", "cloudflare", "civitai", "huggingface", "hf"]:
+        if first_part in ["r2", "cloudflare", "civitai", "huggingface", "hf", "url", "direct"]:
             if len(parts) < 4:
                 log_error(
                     f"Line {line_num}: Enhanced format requires: source|identifier|filename|subdir[|checksum]"
@@ -100,52 +1991,344 @@ class EnhancedModelDownloader:
                 "line_num": line_num,
             }
 
+    def _hf_request(self, model_info):
+        """Resolve URL and auth headers for a HuggingFace Hub file"""
+        url = f"{self.hf_endpoint}/{model_info['identifier']}/resolve/main/{model_info['filename']}"
+        headers = {}
+        if self.hf_token:
+            headers["Authorization"] = f"Bearer {self.hf_token}"
+        return url, headers
+
+    def _civitai_headers(self):
+        headers = {
+            "User-Agent": "AiClipse-ComfyUI/1.0 (https://github.com/nishit-g/aiclipse-comfyui)"
+        }
+        if self.civitai_token:
+            headers["Authorization"] = f"Bearer {self.civitai_token}"
+        return headers
+
+    def _r2_location(self, identifier):
+        """Split an R2 identifier into (bucket, key)
+
+        Handles identifier formats:
+        1. "bucket/path/file.ext" - full path
+        2. "path/file.ext" - use default bucket
+        """
+        if "/" in identifier and not self.r2_bucket:
+            # Format: bucket/key
+            return tuple(identifier.split("/", 1))
+        if self.r2_bucket:
+            # Use default bucket
+            return self.r2_bucket, identifier
+        raise Exception(
+            f"R2 identifier must include bucket or set R2_BUCKET environment variable. Got: {identifier}"
+        )
+
+    def resolve_model(self, model_info):
+        """Look up where and what a manifest entry is, without fetching it.
+
+        Returns (and caches on model_info["resolved"]) a dict with the
+        download url, request headers, actual filename, size and SHA256
+        when the source publishes them. --plan and the real download path
+        share this, so metadata is only requested once per run.
+        """
+        if "resolved" in model_info:
+            return model_info["resolved"]
+
+        resolvers = {
+            "huggingface": self._resolve_huggingface,
+            "r2": self._resolve_r2,
+            "civitai": self._resolve_civitai,
+            "url": self._resolve_url,
+        }
+        resolver = resolvers.get(canonical_source(model_info["source"]))
+        if not resolver:
+            raise Exception(
+                f"Unsupported source type: {model_info['source']}. Supported: {list(resolvers.keys())}"
+            )
+
+        resolved = {
+            "url": None,
+            "headers": {},
+            "filename": model_info["filename"],
+            "size": None,
+            "sha256": None,
+        }
+        started = time.monotonic()
+        try:
+            resolved.update(resolver(model_info))
+        finally:
+            stats = model_info.setdefault("stats", {})
+            stats["resolve_s"] = stats.get("resolve_s", 0) + time.monotonic() - started
+        model_info["resolved"] = resolved
+        return resolved
+
+    def _resolve_huggingface(self, model_info):
+        url, headers = self._hf_request(model_info)
+        resolved = {"url": url, "headers": headers}
+
+        # The Hub answers HEAD on resolve/ with the LFS size and SHA256 in
+        # X-Linked-* headers before redirecting to the CDN
+        head_url = url
+        for _ in range(5):
+            r = self.session.head(
+                head_url, headers=headers, allow_redirects=False, timeout=30
+            )
+            location = r.headers.get("Location", "")
+            if r.is_redirect and "X-Linked-Size" not in r.headers and location.startswith("/"):
+                # Renamed repo: the Hub redirects to the canonical path first
+                head_url = f"{self.hf_endpoint}{location}"
+                continue
+            break
+        if r.status_code >= 400:
+            raise Exception(f"HuggingFace file not found: {url} (HTTP {r.status_code})")
+
+        size = r.headers.get("X-Linked-Size") or r.headers.get("Content-Length")
+        if size and size.isdigit():
+            resolved["size"] = int(size)
+        etag = (r.headers.get("X-Linked-Etag") or "").strip('"').lower()
+        if len(etag) == 64:
+            resolved["sha256"] = etag
+        resolved["revision"] = r.headers.get("X-Repo-Commit")
+        return resolved
+
+    def _resolve_r2(self, model_info):
+        if not self.r2_client:
+            raise Exception(
+                "R2 client not configured. Set R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_ACCOUNT_ID environment variables"
+            )
+        bucket, key = self._r2_location(model_info["identifier"])
+        try:
+            response = self.r2_client.head_object(Bucket=bucket, Key=key)
+        except Exception as e:
+            raise Exception(f"Object not found in R2: s3://{bucket}/{key} - {e}")
+
+        sha256 = (response.get("Metadata") or {}).get("sha256")
+        return {
+            "bucket": bucket,
+            "key": key,
+            "size": response.get("ContentLength", 0),
+            "etag": response.get("ETag"),
+            "sha256": sha256.lower() if sha256 else None,
+        }
+
+    def _civitai_model(self, model_id, kind="model"):
+        """File index for a CivitAI model (or, with kind="version", a single
+        model version), from memory, disk cache or API.
+
+        Entries for the same model share one lookup; concurrent resolvers
+        for it wait on the same lock instead of racing the API.
+        """
+        cache_key = model_id if kind == "model" else f"version:{model_id}"
+        with self._named_lock(("civitai", cache_key)):
+            if cache_key in self._civitai_indexes:
+                return self._civitai_indexes[cache_key]
+
+            model_data = self.civitai_cache.get(cache_key)
+            if model_data is None:
+                if kind == "model":
+                    model_data = self._fetch_civitai_model(model_id)
+                else:
+                    model_data = {"modelVersions": [self._fetch_civitai_version(model_id)]}
+                model_data = _trim_civitai_model(model_data)
+                self.civitai_cache.put(cache_key, model_data)
+            else:
+                log(f"🎨 CivitAI {kind} info for {model_id} (cached)")
+
+            index = civitai_file_index(model_data)
+            index["versions"] = model_data.get("modelVersions", [])
+            self._civitai_indexes[cache_key] = index
+            return index
+
+    def _civitai_get(self, path, description):
+        api_url = f"{self.civitai_api}/{path}"
+        log(f"🎨 Fetching CivitAI {description}")
+
+        # Rate limits and transient errors are retried by the session
+        try:
+            response = self.session.get(
+                api_url, headers=self._civitai_headers(), timeout=30
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException as e:
+            raise Exception(f"Failed to fetch {description}: {e}")
+
+    def _fetch_civitai_model(self, model_id):
+        return self._civitai_get(f"models/{model_id}", f"model info: {model_id}")
+
+    def _fetch_civitai_version(self, version_id):
+        return self._civitai_get(f"model-versions/{version_id}", f"model version info: {version_id}")
+
+    @staticmethod
+    def _civitai_match(index, requested_filename):
+        # Match strategies:
+        # 1. Exact filename match
+        # 2. 'auto' or 'latest' - use primary file
+        # 3. Extension match (e.g., ".safetensors")
+        if requested_filename.lower() in ["auto", "latest"]:
+            return index["names"].get(requested_filename) or index["primary"]
+        if requested_filename.startswith("."):
+            return index["names"].get(requested_filename) or index[
+                "suffixes"
+            ].get(requested_filename)
+        return index["names"].get(requested_filename)
+
+    def _resolve_civitai(self, model_info):
+        """Identifiers are 'version:<id>', 'model:<id>' or a bare id.
+
+        A bare id is looked up as a model version first, which is what the
+        boot path's /api/download/models/<id> URLs always meant, and as a
+        model if that version does not exist or lacks the requested file.
+        Model and version ids share one numeric space, so a bare id that an
+        older manifest meant as a model can match an unrelated version: a
+        version whose file contradicts the entry's checksum is skipped, and
+        any other match is logged so the entry can be made explicit.
+        """
+        kind, _, model_id = model_info["identifier"].rpartition(":")
+        if kind not in ("", "model", "version"):
+            raise Exception(
+                f"Invalid CivitAI identifier '{model_info['identifier']}' "
+                "(expected <id>, model:<id> or version:<id>)"
+            )
+        requested_filename = model_info["filename"]
+        bare = not kind
+
+        file_metadata = None
+        errors = []
+        for kind in [kind] if kind else ["version", "model"]:
+            try:
+                index = self._civitai_model(model_id, kind)
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            file_metadata = self._civitai_match(index, requested_filename)
+            if file_metadata and bare and kind == "version":
+                version = index["versions"][0] if index["versions"] else {}
+                owner = version.get("modelId")
+                sha256 = (file_metadata.get("hashes") or {}).get("SHA256")
+                checksum = model_info["checksum"]
+                if checksum and sha256 and sha256.lower() != checksum.lower():
+                    errors.append(
+                        f"Version {model_id} (model {owner}) has {file_metadata.get('name')} "
+                        f"with a different SHA256 than the manifest"
+                    )
+                    file_metadata = None
+                    continue
+                log(
+                    f"⚠️ CivitAI id {model_id} resolved as a model version "
+                    f"(of model {owner or 'unknown'}: {file_metadata.get('name')}); "
+                    f"write version:{model_id} or model:{model_id} in the manifest "
+                    f"to say which is meant"
+                )
+            if file_metadata:
+                break
+
+            # Show available files for debugging
+            available_files = []
+            for version in index["versions"][:2]:  # Show first 2 versions
+                version_name = version.get("name", "Unknown")
+                for file in version.get("files", []):
+                    available_files.append(f"{file['name']} (v:{version_name})")
+            errors.append(
+                f"File '{requested_filename}' not found in {kind} {model_id}. "
+                f"Available files: {available_files[:10]}"
+            )
+
+        if not file_metadata:
+            raise Exception("; ".join(errors))
+
+        sha256 = (file_metadata.get("hashes") or {}).get("SHA256")
+        return {
+            "url": file_metadata["downloadUrl"],
+            "headers": self._civitai_headers(),
+            "filename": file_metadata.get("name", requested_filename),
+            "size": int(file_metadata["sizeKB"] * 1024) if file_metadata.get("sizeKB") else None,
+            "sha256": sha256.lower() if sha256 else None,
+        }
+
+    def _resolve_url(self, model_info):
+        url = model_info["identifier"]
+        resolved = {"url": url}
+        try:
+            r = self.session.head(url, allow_redirects=True, timeout=30)
+            length = r.headers.get("Content-Length")
+            if r.ok and length and length.isdigit():
+                resolved["size"] = int(length)
+                return resolved
+        except requests.RequestException:
+            pass
+        # Some servers reject HEAD; a one-byte Range GET works everywhere
+        resolved["size"] = self.engine.probe(url)["size"] or None
+        return resolved
+
+    def _fetch(self, url, target_file, model_info, headers=None):
+        """Download through the engine and record the streamed digest, so
+        the checksum check afterwards is a cache hit instead of a re-read"""
+        source = canonical_source(model_info["source"])
+        stats = model_info.setdefault("stats", {})
+        buckets = [
+            bucket
+            for bucket in (self.bandwidth, self.source_bandwidth.get(source))
+            if bucket and bucket.rate
+        ]
+
+        def throttle(nbytes):
+            for bucket in buckets:
+                bucket.take(nbytes)
+
+        started = time.monotonic()
+        try:
+            result = self.engine.download(
+                url,
+                target_file,
+                headers=headers,
+                stats=stats,
+                on_bytes=lambda n: self.telemetry.add_bytes(source, n),
+                throttle=throttle if buckets else None,
+            )
+        finally:
+            stats["transfer_s"] = time.monotonic() - started
+        if result["sha256"]:
+            self.checksum_cache.put(target_file, result["sha256"])
+        return result
+
     def download_huggingface(self, model_info):
         """Download from HuggingFace Hub"""
         try:
-            repo_id = model_info["identifier"]
-            filename = model_info["filename"]
-            target_dir = self.models_dir / model_info["subdir"]
-            target_dir.mkdir(parents=True, exist_ok=True)
+            resolved = self.resolve_model(model_info)
+            target_file = self.models_dir / model_info["subdir"] / model_info["filename"]
+            target_file.parent.mkdir(parents=True, exist_ok=True)
 
-            log(f"📥 Downloading from HuggingFace: {repo_id}/{filename}")
+            log(f"📥 Downloading from HuggingFace: {model_info['identifier']}/{model_info['filename']}")
 
-            downloaded_path = hf_hub_download(
-                repo_id=repo_id,
-                filename=filename,
-                local_dir=target_dir,
-                token=self.hf_token,
-                local_dir_use_symlinks=False,
-            )
+            # The resolve endpoint redirects to the CDN, which serves Range
+            # requests, so HF gets the same segmented/resumable transfer
+            self._fetch(resolved["url"], target_file, model_info, headers=resolved["headers"])
 
-            return downloaded_path
+            return str(target_file)
         except Exception as e:
             raise Exception(f"HuggingFace download failed: {e}")
 
+    def download_url(self, model_info):
+        """Download from a direct URL"""
+        try:
+            resolved = self.resolve_model(model_info)
+            target_file = self.models_dir / model_info["subdir"] / model_info["filename"]
+            target_file.parent.mkdir(parents=True, exist_ok=True)
+
+            log(f"🌐 Downloading from URL: {resolved['url']}")
+            self._fetch(resolved["url"], target_file, model_info)
+
+            return str(target_file)
+        except Exception as e:
+            raise Exception(f"URL download failed: {e}")
+
     def download_r2(self, model_info):
         """Download from Cloudflare R2"""
-        if not self.r2_client:
-            raise Exception(
-                "R2 client not configured. Set R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_ACCOUNT_ID environment variables"
-            )
-
         try:
-            # Handle identifier formats:
-            # 1. "bucket/path/file.ext" - full path
-            # 2. "path/file.ext" - use default bucket
-            identifier = model_info["identifier"]
-
-            if "/" in identifier and not self.r2_bucket:
-                # Format: bucket/key
-                bucket, key = identifier.split("/", 1)
-            elif self.r2_bucket:
-                # Use default bucket
-                bucket = self.r2_bucket
-                key = identifier
-            else:
-                raise Exception(
-                    f"R2 identifier must include bucket or set R2_BUCKET environment variable. Got: {identifier}"
-                )
+            resolved = self.resolve_model(model_info)
+            bucket, key = resolved["bucket"], resolved["key"]
 
             target_file = (
                 self.models_dir / model_info["subdir"] / model_info["filename"]
@@ -153,17 +2336,15 @@ class EnhancedModelDownloader:
             target_file.parent.mkdir(parents=True, exist_ok=True)
 
             log(f"☁️ Downloading from R2: s3://{bucket}/{key}")
+            log(f"📦 File size: {resolved.get('size') or 0:,} bytes")
 
-            # Check if object exists and get size
-            try:
-                response = self.r2_client.head_object(Bucket=bucket, Key=key)
-                file_size = response.get("ContentLength", 0)
-                log(f"📦 File size: {file_size:,} bytes")
-            except Exception as e:
-                raise Exception(f"Object not found in R2: s3://{bucket}/{key} - {e}")
-
-            # Download file
-            self.r2_client.download_file(bucket, key, str(target_file))
+            # Download through a presigned URL so R2 uses the same ranged
+            # engine as every other HTTP source. Signed here rather than at
+            # resolve time so a long queue cannot outlive the signature.
+            url = self.r2_client.generate_presigned_url(
+                "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=3600
+            )
+            self._fetch(url, target_file, model_info)
 
             return str(target_file)
         except Exception as e:
@@ -172,149 +2353,64 @@ class EnhancedModelDownloader:
     def download_civitai(self, model_info):
         """Download from CivitAI"""
         try:
-            model_id = model_info["identifier"]
-            requested_filename = model_info["filename"]
+            resolved = self.resolve_model(model_info)
+            actual_filename = resolved["filename"]
 
-            # CivitAI API endpoint
-            api_url = f"https://civitai.com/api/v1/models/{model_id}"
-
-            headers = {
-                "User-Agent": "AiClipse-ComfyUI/1.0 (https://github.com/nishit-g/aiclipse-comfyui)"
-            }
-            if self.civitai_token:
-                headers["Authorization"] = f"Bearer {self.civitai_token}"
-
-            log(f"🎨 Fetching CivitAI model info: {model_id}")
-
-            # Get model info with retries
-            for attempt in range(3):
-                try:
-                    response = requests.get(api_url, headers=headers, timeout=30)
-                    response.raise_for_status()
-                    model_data = response.json()
-                    break
-                except requests.RequestException as e:
-                    if attempt == 2:
-                        raise Exception(
-                            f"Failed to fetch model info after 3 attempts: {e}"
-                        )
-                    log(f"⚠️ Attempt {attempt + 1} failed, retrying...")
-                    time.sleep(2)
-
-            # Find the right file
-            download_url = None
-            file_metadata = None
-            actual_filename = requested_filename
-
-            # Look through all versions and files
-            for version in model_data.get("modelVersions", []):
-                for file in version.get("files", []):
-                    file_name = file.get("name", "")
-
-                    # Match strategies:
-                    # 1. Exact filename match
-                    # 2. 'auto' or 'latest' - use primary file
-                    # 3. Extension match (e.g., ".safetensors")
-                    if (
-                        file_name == requested_filename
-                        or requested_filename.lower() in ["auto", "latest"]
-                        and file.get("primary", False)
-                        or requested_filename.startswith(".")
-                        and file_name.endswith(requested_filename)
-                    ):
-
-                        download_url = file["downloadUrl"]
-                        file_metadata = file
-                        actual_filename = file_name
-                        break
-
-                if download_url:
-                    break
-
-            if not download_url:
-                # Show available files for debugging
-                available_files = []
-                for version in model_data.get("modelVersions", [])[
-                    :2
-                ]:  # Show first 2 versions
-                    version_name = version.get("name", "Unknown")
-                    for file in version.get("files", []):
-                        available_files.append(f"{file['name']} (v:{version_name})")
-
-                raise Exception(
-                    f"File '{requested_filename}' not found. Available files: {available_files[:10]}"
-                )
-
-            # Update filename if auto-detected
-            model_info["filename"] = actual_filename
-
-            # Prepare download
-            target_file = self.models_dir / model_info["subdir"] / actual_filename
+            # model_info["filename"] stays as the manifest wrote it ('auto',
+            # '.safetensors'): lock_key() and the lockfile are keyed on it
+            target_file = self.target_path(model_info)
             target_file.parent.mkdir(parents=True, exist_ok=True)
 
-            file_size = (
-                file_metadata.get("sizeKB", 0) * 1024
-                if file_metadata.get("sizeKB")
-                else 0
-            )
+            file_size = resolved["size"] or 0
             log(f"🔥 Downloading from CivitAI: {actual_filename} ({file_size:,} bytes)")
 
-            # Download with progress and retries
-            for attempt in range(3):
-                try:
-                    with requests.get(
-                        download_url, headers=headers, stream=True, timeout=60
-                    ) as r:
-                        r.raise_for_status()
-                        total_size = int(r.headers.get("content-length", file_size))
-                        downloaded = 0
-
-                        with open(target_file, "wb") as f:
-                            for chunk in r.iter_content(chunk_size=8192):
-                                f.write(chunk)
-                                downloaded += len(chunk)
-
-                                # Show progress every MB
-                                if (
-                                    downloaded % (1024 * 1024) == 0
-                                    or downloaded == total_size
-                                ):
-                                    if total_size > 0:
-                                        percent = (downloaded / total_size) * 100
-                                        print(
-                                            f"\r📥 Progress: {percent:.1f}% ({downloaded:,}/{total_size:,} bytes)",
-                                            end="",
-                                            flush=True,
-                                        )
-
-                        print()  # New line
-                    break
-
-                except requests.RequestException as e:
-                    if attempt == 2:
-                        raise Exception(f"Download failed after 3 attempts: {e}")
-                    log(f"⚠️ Download attempt {attempt + 1} failed, retrying...")
-                    if target_file.exists():
-                        target_file.unlink()  # Remove partial file
-                    time.sleep(5)
+            # Partial data stays in <file>.part so a retry resumes it
+            self._fetch(resolved["url"], target_file, model_info, headers=resolved["headers"])
 
             return str(target_file)
         except Exception as e:
             raise Exception(f"CivitAI download failed: {e}")
 
-    def verify_checksum(self, file_path, expected_checksum):
+    def _hash_future(self, file_path):
+        """Start (or join) hashing file_path on the hash pool"""
+        key = os.path.abspath(file_path)
+        with self._hash_futures_lock:
+            future = self._hash_futures.get(key)
+            if future is None or future.done():
+                future = self.hash_pool.submit(self._hash_and_cache, file_path)
+                self._hash_futures[key] = future
+            return future
+
+    def _hash_and_cache(self, file_path):
+        cached = self.checksum_cache.get(file_path)
+        if cached:
+            return cached
+        digest = hash_file(file_path)
+        self.checksum_cache.put(file_path, digest)
+        return digest
+
+    def prefetch_hashes(self, jobs):
+        """Queue hashing of existing, checksummed files ahead of their turn"""
+        for model_info in jobs:
+            target_file = self.target_path(model_info)
+            if model_info["checksum"] and model_present(target_file):
+                if not self.checksum_cache.get(target_file):
+                    self._hash_future(target_file)
+
+    def verify_checksum(self, file_path, expected_checksum, stats=None):
         """Verify file checksum (SHA256)"""
         if not expected_checksum:
             return True
 
+        started = time.monotonic()
         try:
-            log(f"🔍 Verifying checksum for {Path(file_path).name}...")
-            sha256_hash = hashlib.sha256()
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
+            actual_checksum = self.checksum_cache.get(file_path)
+            if actual_checksum:
+                log(f"🔍 Verifying checksum for {Path(file_path).name} (cached)...")
+            else:
+                log(f"🔍 Verifying checksum for {Path(file_path).name}...")
+                actual_checksum = self._hash_future(file_path).result()
 
-            actual_checksum = sha256_hash.hexdigest()
             matches = actual_checksum.lower() == expected_checksum.lower()
 
             if matches:
@@ -328,26 +2424,137 @@ class EnhancedModelDownloader:
         except Exception as e:
             log_error(f"Checksum verification failed: {e}")
             return False
+        finally:
+            if stats is not None:
+                stats["verify_s"] = stats.get("verify_s", 0) + time.monotonic() - started
+
+    def _named_lock(self, key):
+        with self._target_locks_guard:
+            return self._target_locks.setdefault(key, threading.Lock())
+
+    def target_path(self, model_info):
+        filename = model_info.get("resolved", {}).get("filename") or model_info["filename"]
+        return self.models_dir / model_info["subdir"] / filename
+
+    def estimate_size(self, model_info):
+        """Size used to order downloads (bytes); resolves missing entries"""
+        target_file = self.target_path(model_info)
+        if model_present(target_file):
+            return target_file.stat().st_size
+
+        try:
+            size = self.resolve_model(model_info)["size"]
+            if size:
+                return size
+        except Exception:
+            # Not cached, so the download retries it and reports the error
+            pass
+
+        typical_mb = TYPICAL_SIZES_MB.get(
+            model_info["subdir"].split("/")[0], DEFAULT_TYPICAL_SIZE_MB
+        )
+        return typical_mb * 1024 * 1024
 
     def download_model(self, model_info):
         """Download model based on source type"""
-        target_file = self.models_dir / model_info["subdir"] / model_info["filename"]
+        with self._named_lock((model_info["subdir"], model_info["filename"])):
+            checksum = model_info["checksum"]
+            if not checksum:
+                return self._download_model(model_info)
+            # Entries sharing a checksum wait for one download, then link
+            with self._named_lock(("sha256", checksum.lower())):
+                return self._download_model(model_info)
+
+    def _store_file(self, file_path, digest=None):
+        """Deduplicate a verified file into the content-addressed store"""
+        digest = digest or self.checksum_cache.get(file_path)
+        if not self.store or not digest:
+            return
+        if self.store.ingest(file_path, digest):
+            # Relinking changes the inode the cache entry was keyed on
+            self.checksum_cache.put(file_path, digest)
+
+    def fetch_from_peers(self, model_info, digest, target_file):
+        """Copy a verified blob from the first peer that has it.
+
+        Only entries with a known SHA256 are asked for, and the copy must
+        hash to it; anything else falls through to the upstream source.
+        """
+        if not digest or not self.peers:
+            return False
+
+        for peer in self.peers:
+            if peer in self._dead_peers:
+                continue
+            url = f"{peer}/sha256/{digest}"
+            try:
+                # Plain HEAD without the session's retries: a missing peer
+                # must cost one connect timeout, not a backoff cycle
+                response = requests.head(url, timeout=(2, 10))
+            except requests.RequestException:
+                log_error(f"Peer {peer} unreachable, skipping it for this run")
+                self._dead_peers.add(peer)
+                continue
+            if response.status_code != 200:
+                continue
+
+            log(f"🤝 Fetching {target_file.name} from peer {peer}")
+            target_file.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                self._fetch(url, target_file, model_info)
+            except Exception as e:
+                log_error(f"Peer {peer} failed for {target_file.name}: {e}")
+                continue
+            if self.verify_checksum(target_file, digest, model_info.setdefault("stats", {})):
+                model_info["stats"]["peer"] = peer
+                return True
+            target_file.unlink(missing_ok=True)
+        return False
+
+    def expected_checksum(self, model_info):
+        """Manifest checksum, else the SHA256 the source publishes"""
+        if model_info["checksum"]:
+            return model_info["checksum"].lower()
+        return self.resolve_model(model_info)["sha256"]
+
+    def _download_model(self, model_info):
+        target_file = self.target_path(model_info)
+        stats = model_info.setdefault("stats", {})
 
         # Check if file already exists and verify if needed
-        if target_file.exists():
+        if model_present(target_file) and model_info.get("refresh") and not model_info["checksum"]:
+            # The entry's source changed and nothing proves the file matches it
+            log(f"🔄 Re-downloading {target_file.name} (manifest entry changed)")
+        elif model_present(target_file):
             if model_info["checksum"]:
-                if self.verify_checksum(target_file, model_info["checksum"]):
+                if self.verify_checksum(target_file, model_info["checksum"], stats):
                     log(
-                        f"⭐ Skipping {model_info['filename']} (exists, checksum verified)"
+                        f"⭐ Skipping {target_file.name} (exists, checksum verified)"
                     )
+                    self._store_file(target_file, model_info["checksum"])
+                    self.cache.record(target_file, used=False)
+                    stats["status"] = "present"
                     return str(target_file)
                 else:
-                    log(f"🔄 Re-downloading {model_info['filename']} (checksum failed)")
+                    log(f"🔄 Re-downloading {target_file.name} (checksum failed)")
                     target_file.unlink()
             else:
-                log(f"⭐ Skipping {model_info['filename']} (already exists)")
+                log(f"⭐ Skipping {target_file.name} (already exists)")
+                self._store_file(target_file)
+                self.cache.record(target_file, used=False)
+                stats["status"] = "present"
                 return str(target_file)
 
+        # Same weights already stored under another name, subdir or template
+        checksum = self.expected_checksum(model_info)
+        target_file = self.target_path(model_info)
+        if self.store and checksum and self.store.link_into(checksum, target_file):
+            self.checksum_cache.put(target_file, checksum)
+            log(f"🔗 Linked {target_file.name} from model store ({checksum[:16]}...)")
+            self.cache.record(target_file)
+            stats["status"] = "linked"
+            return str(target_file)
+
         # Download based on source type
         downloaders = {
             "huggingface": self.download_huggingface,
@@ -355,6 +2562,8 @@ class EnhancedModelDownloader:
             "r2": self.download_r2,
             "cloudflare": self.download_r2,
             "civitai": self.download_civitai,
+            "url": self.download_url,
+            "direct": self.download_url,
         }
 
         downloader = downloaders.get(model_info["source"])
@@ -363,25 +2572,474 @@ class EnhancedModelDownloader:
                 f"Unsupported source type: {model_info['source']}. Supported: {list(downloaders.keys())}"
             )
 
-        # Perform download
-        downloaded_path = downloader(model_info)
+        # Perform download, after making room for it
+        try:
+            expected_size = self.resolve_model(model_info)["size"]
+        except Exception:
+            # Upstream metadata unavailable; a peer may still have the file
+            if not (checksum and self.peers):
+                raise
+            expected_size = None
+        self.cache.reserve(target_file, expected_size)
+        try:
+            if self.fetch_from_peers(model_info, checksum, target_file):
+                downloaded_path = str(target_file)
+            else:
+                downloaded_path = downloader(model_info)
+        finally:
+            self.cache.release(target_file)
 
-        # Verify checksum if provided
-        if model_info["checksum"]:
-            if not self.verify_checksum(downloaded_path, model_info["checksum"]):
+        # Verify checksum if provided (by the manifest or the source)
+        if checksum:
+            if not self.verify_checksum(downloaded_path, checksum, stats):
                 log_error(
-                    f"❌ Checksum verification failed for {model_info['filename']}"
+                    f"❌ Checksum verification failed for {Path(downloaded_path).name}"
                 )
                 if os.path.exists(downloaded_path):
                     os.remove(downloaded_path)
                 return None
 
         # Success
+        self._store_file(downloaded_path, checksum)
+        self.cache.record(downloaded_path)
         file_size = os.path.getsize(downloaded_path)
-        log(f"✅ Downloaded: {model_info['filename']} ({file_size:,} bytes)")
+        stats["status"] = "downloaded"
+        transfer_s = stats.get("transfer_s")
+        if transfer_s and stats.get("bytes", 0) >= 1024**2:
+            rate = f", {stats['bytes'] / transfer_s / 1024**2:.1f} MB/s"
+        else:
+            rate = ""
+        log(f"✅ Downloaded: {Path(downloaded_path).name} ({file_size:,} bytes{rate})")
         return downloaded_path
 
-    def process_manifest(self, manifest_file):
+    def load_manifest(self, manifest_file):
+        """Parse a manifest into (entries, invalid_line_count)"""
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        jobs = []
+        error_count = 0
+        for line_num, line in enumerate(lines, 1):
+            line = line.strip()
+
+            # Skip comments and empty lines
+            if not line or line.startswith("#"):
+                continue
+
+            # Parse line
+            model_info = self.parse_manifest_line(line, line_num)
+            if not model_info:
+                error_count += 1
+                continue
+
+            jobs.append(model_info)
+
+        if self.lock_entries:
+            self.apply_lockfile(jobs)
+        return jobs, error_count
+
+    @staticmethod
+    def lock_key(model_info):
+        return f"{model_info['subdir']}/{model_info['filename']}"
+
+    def _auth_headers(self, model_info):
+        source = canonical_source(model_info["source"])
+        if source == "huggingface":
+            return self._hf_request(model_info)[1]
+        if source == "civitai":
+            return self._civitai_headers()
+        return {}
+
+    def apply_lockfile(self, jobs):
+        """Take each entry's resolution from the lockfile, so no metadata
+        request is made for it; entries the lock does not match are
+        resolved as usual"""
+        stale = []
+        for model_info in jobs:
+            entry = self.lock_entries.get(self.lock_key(model_info))
+            if (
+                not entry
+                or entry["source"] != canonical_source(model_info["source"])
+                or entry["identifier"] != model_info["identifier"]
+                or (
+                    model_info["checksum"]
+                    and entry.get("sha256")
+                    and model_info["checksum"].lower() != entry["sha256"]
+                )
+            ):
+                stale.append(self.lock_key(model_info))
+                continue
+
+            resolved = {
+                "url": entry.get("url"),
+                "headers": self._auth_headers(model_info),
+                "filename": entry["filename"],
+                "size": entry.get("size"),
+                "sha256": entry.get("sha256"),
+            }
+            for field in ("revision", "bucket", "key", "etag"):
+                if field in entry:
+                    resolved[field] = entry[field]
+            model_info["resolved"] = resolved
+            # The locked digest verifies, dedups and links like a manifest checksum
+            if not model_info["checksum"] and entry.get("sha256"):
+                model_info["checksum"] = entry["sha256"]
+
+        log(f"🔒 {len(jobs) - len(stale)}/{len(jobs)} entries pinned by the lockfile")
+        for key in stale:
+            log(f"🔓 {key}: not in the lockfile (or changed), resolving")
+
+    def _lock_entry(self, model_info):
+        key = self.lock_key(model_info)
+        try:
+            resolved = self.resolve_model(model_info)
+        except Exception as e:
+            log_error(f"Not locking {key}: {e}")
+            return None
+
+        target_file = self.target_path(model_info)
+        present = model_present(target_file)
+        sha256 = model_info["checksum"] or resolved["sha256"]
+        if not sha256 and present:
+            sha256 = self.checksum_cache.get(target_file) or self._hash_future(target_file).result()
+
+        url = resolved["url"]
+        if canonical_source(model_info["source"]) == "huggingface" and resolved.get("revision"):
+            # Pin the commit the branch pointed at, not "main"
+            url = (
+                f"{self.hf_endpoint}/{model_info['identifier']}/resolve/"
+                f"{resolved['revision']}/{model_info['filename']}"
+            )
+
+        size = resolved.get("size")
+        if size is None and present:
+            size = target_file.stat().st_size
+        entry = {
+            "source": canonical_source(model_info["source"]),
+            "identifier": model_info["identifier"],
+            "filename": target_file.name,
+            "url": url,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+        }
+        for field in ("revision", "bucket", "key", "etag"):
+            if resolved.get(field):
+                entry[field] = resolved[field]
+        return key, entry
+
+    def write_lockfile(self, jobs, lock_file):
+        """Pin every entry to its resolved URL, revision, size and SHA256"""
+        with ThreadPoolExecutor(max_workers=max(8, self.workers)) as pool:
+            entries = dict(filter(None, pool.map(self._lock_entry, jobs)))
+
+        lock = {
+            "version": 1,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "entries": dict(sorted(entries.items())),
+        }
+        lock_file = Path(lock_file)
+        try:
+            with open(lock_file, "r", encoding="utf-8") as f:
+                unchanged = json.load(f).get("entries") == lock["entries"]
+        except (OSError, ValueError, AttributeError):
+            unchanged = False
+        if unchanged:
+            # setup_models.sh refreshes the lock on every boot; keep the file as is
+            log(f"🔒 {lock_file} is up to date ({len(entries)}/{len(jobs)} entries)")
+            return len(entries) == len(jobs)
+        lock_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = lock_file.with_name(lock_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(lock, f, indent=2)
+            f.write("\n")
+        os.replace(tmp_file, lock_file)
+
+        unpinned = sum(1 for entry in entries.values() if not entry["sha256"])
+        log(
+            f"🔒 Wrote {lock_file} ({len(entries)}/{len(jobs)} entries"
+            + (f", {unpinned} without SHA256" if unpinned else "")
+            + ")"
+        )
+        return len(entries) == len(jobs)
+
+    def _size_all(self, jobs):
+        """Resolve entries concurrently and record each one's size"""
+        with ThreadPoolExecutor(max_workers=max(8, self.workers)) as pool:
+            sizes = list(pool.map(self.estimate_size, jobs))
+        for model_info, size in zip(jobs, sizes):
+            model_info["size"] = size
+
+    def workflow_readiness(self, jobs):
+        """Readiness tracker for the configured workflows, if any"""
+        workflows = load_workflow_references(self.workflow_paths)
+        workflows = {name: refs for name, refs in workflows.items() if refs}
+        if not workflows:
+            return None
+
+        # (filename, bytes still to fetch) per manifest entry
+        manifest = []
+        for model_info in jobs:
+            target_file = self.target_path(model_info)
+            remaining = 0 if model_present(target_file) else model_info["size"]
+            manifest.append((target_file.name, remaining))
+        log(f"🎯 Prioritizing models for {len(workflows)} workflow(s)")
+        return WorkflowReadiness(
+            workflows, manifest, self.models_dir, self.state_dir, self.telemetry
+        )
+
+    def defer_models(self, jobs, readiness):
+        """--lazy: keep what the workflows need, index the rest for lazy_models.py"""
+        index = self.lazy_index
+        eager = []
+        deferred_bytes = 0
+        known = set()
+        for model_info in jobs:
+            target_file = self.target_path(model_info)
+            key = LazyIndex.key(model_info, target_file)
+            known.add(key)
+            wanted = readiness and readiness.rank(target_file.name) < len(readiness.order)
+            if wanted:
+                eager.append(model_info)
+                index.forget(key)
+            elif model_present(target_file):
+                # Fetched on demand before: still lazily managed (evictable)
+                eager.append(model_info)
+                if key in index.models:
+                    index.register(model_info, target_file, state="fetched")
+            else:
+                index.register(model_info, target_file)
+                deferred_bytes += model_info["size"]
+
+        for key in set(index.models) - known:
+            index.forget(key)
+        index.save()
+
+        deferred = len(jobs) - len(eager)
+        if readiness is None:
+            log("⚠️ --lazy without --workflows: every missing model is deferred")
+        log(
+            f"💤 Deferred {deferred} models (~{deferred_bytes / 1024**3:.1f} GB); "
+            f"lazy_models.py fetches them on first use"
+        )
+        return eager
+
+    def plan_manifest(self, manifest_file, bandwidth_mb=100, lock_file=None):
+        """Resolve every entry and report what a real run would transfer.
+
+        Only metadata is requested (Hub HEAD, R2 head_object, CivitAI model
+        API); existing files are judged by the checksum cache, never hashed.
+        """
+        jobs, error_count = self.load_manifest(manifest_file)
+        self._size_all(jobs)
+        bandwidth = bandwidth_mb * 1024 * 1024
+
+        entries = []
+        for model_info in sorted(jobs, key=lambda m: m["line_num"]):
+            target_file = self.target_path(model_info)
+            entry = {
+                "line": model_info["line_num"],
+                "source": canonical_source(model_info["source"]),
+                "identifier": model_info["identifier"],
+                "subdir": model_info["subdir"],
+                "filename": target_file.name,
+                "target": str(target_file),
+                "size": None,
+                "sha256": model_info["checksum"],
+            }
+            if model_present(target_file):
+                entry["size"] = target_file.stat().st_size
+                cached = self.checksum_cache.get(target_file)
+                if not model_info["checksum"]:
+                    entry["status"] = "present"
+                elif not cached:
+                    entry["status"] = "present-unverified"
+                elif cached == model_info["checksum"].lower():
+                    entry["status"] = "present"
+                else:
+                    entry["status"] = "checksum-mismatch"
+            else:
+                try:
+                    resolved = self.resolve_model(model_info)
+                    entry["size"] = resolved["size"]
+                    entry["sha256"] = self.expected_checksum(model_info)
+                    if self.store and entry["sha256"] and self.store.has(entry["sha256"]):
+                        entry["status"] = "link"
+                    else:
+                        entry["status"] = "download"
+                except Exception as e:
+                    entry["status"] = "error"
+                    entry["error"] = str(e)
+
+            transfer = entry["status"] in ("download", "checksum-mismatch")
+            entry["download_bytes"] = (entry["size"] or 0) if transfer else 0
+            entry["estimated_seconds"] = round(entry["download_bytes"] / bandwidth, 1)
+            entries.append(entry)
+
+        if lock_file:
+            self.write_lockfile(jobs, lock_file)
+
+        download_bytes = sum(e["download_bytes"] for e in entries)
+        statuses = {}
+        for entry in entries:
+            statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+        return {
+            "manifest": str(manifest_file),
+            "bandwidth_mb_s": bandwidth_mb,
+            "entries": entries,
+            "summary": {
+                "entries": len(entries),
+                "invalid_lines": error_count,
+                "statuses": statuses,
+                "download_bytes": download_bytes,
+                "unknown_sizes": sum(
+                    1 for e in entries if e["download_bytes"] == 0 and e["status"] == "download"
+                ),
+                "estimated_seconds": round(download_bytes / bandwidth, 1),
+            },
+        }
+
+    @staticmethod
+    def lint_entry(model_info):
+        """Problems visible in the entry itself: [(level, message)]"""
+        issues = []
+        source = canonical_source(model_info["source"])
+        for field in ("identifier", "filename", "subdir"):
+            if not model_info[field]:
+                issues.append(("error", f"empty {field}"))
+        for field in ("filename", "subdir"):
+            path = model_info[field]
+            if path.startswith(("/", "\\")) or ".." in Path(path).parts:
+                issues.append(("error", f"{field} '{path}' points outside the models dir"))
+        checksum = model_info["checksum"]
+        if checksum and (
+            len(checksum) != 64 or any(c not in "0123456789abcdefABCDEF" for c in checksum)
+        ):
+            issues.append(("error", f"checksum '{checksum}' is not a 64-character SHA256"))
+        if source == "url" and urlparse(model_info["identifier"]).scheme not in ("http", "https"):
+            issues.append(("error", f"'{model_info['identifier']}' is not an http(s) URL"))
+        if source == "huggingface" and "/" not in model_info["identifier"]:
+            # Usually a misspelt source read as a legacy repo_id|filename|subdir line
+            issues.append(("warning", f"'{model_info['identifier']}' is not a HuggingFace repo id (owner/name)"))
+        return issues
+
+    def _validate_remote(self, model_info):
+        """(level, message) if the entry's source does not check out, else None.
+
+        Resolutions are cached in validate_cache.json, so re-running a CI
+        check only asks the sources about entries that changed.
+        """
+        source = canonical_source(model_info["source"])
+        if source == "r2" and not self.r2_client:
+            return "warning", "not checked: R2 credentials are not set"
+
+        key = "|".join((source, model_info["identifier"], model_info["filename"]))
+        resolved = self.validate_cache.get(key)
+        if resolved is None:
+            try:
+                resolved = self.resolve_model(model_info)
+            except Exception as e:
+                message = str(e)
+                token = {"huggingface": self.hf_token, "civitai": self.civitai_token}.get(source)
+                denied = ("HTTP 401", "HTTP 403", "401 Client Error", "403 Client Error")
+                if any(code in message for code in denied) and not token:
+                    return "warning", f"not checked: gated or private without a token ({message})"
+                return "error", message
+            resolved = {name: resolved[name] for name in ("filename", "size", "sha256")}
+            self.validate_cache.put(key, resolved)
+        model_info["resolved"] = resolved
+        return None
+
+    def validate_manifests(self, manifest_files, remote=False):
+        """Parse and lint manifests together, optionally checking every
+        entry against its source.
+
+        Reported per entry: invalid lines, lint problems, duplicates and
+        entries that write the same file (within a manifest an error; across
+        manifests a warning, as the template entry replaces the base one when
+        merged) and, with remote, entries the source does not have. Returns
+        {"entries", "issues": [(level, file, line, message)], "sizes"}.
+        """
+        issues = []
+        entries = []
+        for manifest_file in manifest_files:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                for line_num, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    model_info = self.parse_manifest_line(line, line_num)
+                    if not model_info:
+                        issues.append(("error", manifest_file, line_num, "invalid line"))
+                        continue
+                    model_info["manifest"] = manifest_file
+                    entries.append(model_info)
+                    for level, message in self.lint_entry(model_info):
+                        issues.append((level, manifest_file, line_num, message))
+                        model_info["invalid"] = model_info.get("invalid") or level == "error"
+
+        if remote:
+            # Entries repeated across manifests are asked about once
+            unique = {}
+            for model_info in entries:
+                if model_info.get("invalid"):
+                    continue
+                key = (canonical_source(model_info["source"]), model_info["identifier"], model_info["filename"])
+                unique.setdefault(key, []).append(model_info)
+            with ThreadPoolExecutor(max_workers=max(8, self.workers)) as pool:
+                results = pool.map(lambda group: self._validate_remote(group[0]), unique.values())
+                for group, result in zip(unique.values(), results):
+                    for model_info in group:
+                        if "resolved" in group[0]:
+                            model_info["resolved"] = group[0]["resolved"]
+                        if result:
+                            issues.append((result[0], model_info["manifest"], model_info["line_num"], result[1]))
+                        published = model_info.get("resolved", {}).get("sha256")
+                        if model_info["checksum"] and published and model_info["checksum"].lower() != published:
+                            issues.append(
+                                ("error", model_info["manifest"], model_info["line_num"],
+                                 f"checksum differs from the SHA256 the source publishes ({published})")
+                            )
+
+        seen = {}
+        for model_info in entries:
+            filename = model_info.get("resolved", {}).get("filename") or model_info["filename"]
+            if canonical_source(model_info["source"]) == "civitai" and filename == model_info["filename"] and (
+                filename.lower() in ("auto", "latest") or filename.startswith(".")
+            ):
+                # Unresolved: the real name is only known to CivitAI
+                filename = f"{model_info['identifier']}:{filename}"
+            target = os.path.normpath(os.path.join(model_info["subdir"], filename))
+            identity = (canonical_source(model_info["source"]), model_info["identifier"], model_info["filename"])
+            if target not in seen:
+                seen[target] = (model_info, identity)
+                continue
+            first, first_identity = seen[target]
+            where = f"{first['manifest']}:{first['line_num']}"
+            if first["manifest"] != model_info["manifest"]:
+                if first_identity != identity:
+                    issues.append(
+                        ("warning", model_info["manifest"], model_info["line_num"],
+                         f"{target} also comes from a different source in {where}")
+                    )
+            elif first_identity == identity:
+                issues.append(
+                    ("warning", model_info["manifest"], model_info["line_num"], f"duplicate of line {first['line_num']}")
+                )
+            else:
+                issues.append(
+                    ("error", model_info["manifest"], model_info["line_num"],
+                     f"{target} is also written by line {first['line_num']}")
+                )
+
+        sizes = {}
+        for model_info in entries:
+            size = model_info.get("resolved", {}).get("size")
+            if size:
+                sizes[model_info["manifest"]] = sizes.get(model_info["manifest"], 0) + size
+        issues.sort(key=lambda issue: (manifest_files.index(issue[1]), issue[2]))
+        return {"entries": len(entries), "issues": issues, "sizes": sizes}
+
+    def process_manifest(self, manifest_file, lock_file=None):
         """Process manifest file with all source types"""
         if not os.path.exists(manifest_file):
             log_error(f"Manifest file not found: {manifest_file}")
@@ -392,55 +3050,101 @@ class EnhancedModelDownloader:
         success_count = 0
         error_count = 0
         sources_used = set()
+        counts_lock = threading.Lock()
 
         try:
-            with open(manifest_file, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            # Count valid lines
-            valid_lines = [
-                l for l in lines if l.strip() and not l.strip().startswith("#")
-            ]
-            total_lines = len(valid_lines)
-
+            jobs, error_count = self.load_manifest(manifest_file)
+            all_jobs = list(jobs)
+            sources_used = {canonical_source(m["source"]).upper() for m in jobs}
+            for model_info in jobs:
+                if f"{model_info['subdir']}/{model_info['filename']}" in self.updated_entries:
+                    model_info["refresh"] = True
+
+            total_lines = len(jobs) + error_count
             if total_lines == 0:
                 log("ℹ️ No models found in manifest")
                 return True
 
             log(f"📦 Found {total_lines} models to download")
 
-            for line_num, line in enumerate(lines, 1):
-                line = line.strip()
-
-                # Skip comments and empty lines
-                if not line or line.startswith("#"):
-                    continue
-
-                # Parse line
-                model_info = self.parse_manifest_line(line, line_num)
-                if not model_info:
-                    error_count += 1
-                    continue
+            # Smallest first, so the many small LoRAs/VAEs most workflows
+            # need are not stuck behind a multi-GB UNet
+            self._size_all(jobs)
+            jobs.sort(key=lambda m: (m["size"], m["line_num"]))
+            readiness = self.workflow_readiness(jobs)
+            if readiness:
+                # Stable sort: models the loaded workflows need jump the
+                # queue, smallest first within each workflow
+                jobs.sort(key=lambda m: readiness.rank(self.target_path(m).name))
+                readiness.start()
+            if self.lazy:
+                jobs = self.defer_models(jobs, readiness)
+            elif self.lazy_index.models:
+                # Lazy mode was switched off: everything is eager again
+                for key in list(self.lazy_index.models):
+                    self.lazy_index.forget(key)
+                self.lazy_index.save()
+            # Everything this manifest needs eagerly is exempt from eviction
+            self.cache.pin(
+                self.target_path(m)
+                for m in jobs
+                if LazyIndex.key(m, self.target_path(m)) not in self.lazy_index.models
+            )
+            self.prefetch_hashes(jobs)
 
+            limits = ", ".join(
+                f"{source}={limit}" for source, limit in sorted(self.source_limits.items())
+            )
+            log(f"🚦 Scheduling with {self.workers} workers ({limits or 'no source limits'})")
+            caps = [
+                f"{name}={bucket.rate / (1024 * 1024):g} MB/s"
+                for name, bucket in [("all", self.bandwidth), *sorted(self.source_bandwidth.items())]
+                if bucket.rate
+            ]
+            if caps:
+                log(f"🚦 Bandwidth caps: {', '.join(caps)}")
+            self.telemetry.serve()
+            scheduled_at = time.monotonic()
+
+            def handle(model_info):
+                nonlocal success_count, error_count
+                stats = model_info.setdefault("stats", {})
+                stats["queue_wait_s"] = time.monotonic() - scheduled_at
+                error = None
                 try:
-                    sources_used.add(model_info["source"].upper())
+                    self.telemetry.file_started()
                     downloaded_path = self.download_model(model_info)
+                    ok = bool(downloaded_path)
+                except Exception as e:
+                    ok = False
+                    error = e
+                    log_error(f"Failed {model_info.get('filename', 'unknown')}: {e}")
 
-                    if downloaded_path:
+                # Bookkeeping writes state files too; an OSError here must
+                # fail this job, not the worker and every job queued behind it
+                try:
+                    if error:
+                        # Clean up partial downloads
+                        target_file = self.target_path(model_info)
+                        if target_file.exists() and target_file.stat().st_size == 0:
+                            target_file.unlink()
+
+                    status = stats.get("status", "downloaded") if ok else "failed"
+                    self.telemetry.file_done(model_info, status, error)
+                    if readiness:
+                        readiness.file_done(self.target_path(model_info).name, ok)
+                except Exception as e:
+                    ok = False
+                    log_error(
+                        f"Failed to record {model_info.get('filename', 'unknown')}: {e}"
+                    )
+                with counts_lock:
+                    if ok:
                         success_count += 1
                     else:
                         error_count += 1
 
-                except Exception as e:
-                    error_count += 1
-                    log_error(f"Failed {model_info.get('filename', 'unknown')}: {e}")
-
-                    # Clean up partial downloads
-                    target_file = (
-                        self.models_dir / model_info["subdir"] / model_info["filename"]
-                    )
-                    if target_file.exists() and target_file.stat().st_size == 0:
-                        target_file.unlink()
+            DownloadScheduler(self.workers, self.source_limits).run(jobs, handle)
 
         except Exception as e:
             log_error(f"Failed to process manifest: {e}")
@@ -448,6 +3152,12 @@ class EnhancedModelDownloader:
 
         # Summary
         log(f"📊 Download summary: {success_count} success, {error_count} errors")
+        self.telemetry.summary()
+        if lock_file:
+            try:
+                self.write_lockfile(all_jobs, lock_file)
+            except OSError as e:
+                log_error(f"Could not write lockfile: {e}")
         if sources_used:
             log(f"🌐 Sources used: {', '.join(sorted(sources_used))}")
 
@@ -465,6 +3175,48 @@ def load_config():
         "hf_token": os.getenv("HF_TOKEN"),
         "civitai_token": os.getenv("CIVITAI_TOKEN") or os.getenv("CIVITAI_API_KEY"),
         "r2_config": None,
+        "hf_endpoint": os.getenv("HF_ENDPOINT", "https://huggingface.co"),
+        "civitai_api": os.getenv("CIVITAI_API_BASE", "https://civitai.com/api/v1"),
+        "civitai_cache_ttl": int(os.getenv("CIVITAI_CACHE_TTL", str(24 * 3600))),
+        "validate_cache_ttl": int(os.getenv("VALIDATE_CACHE_TTL") or 3600),
+        "workers": int(os.getenv("PARALLEL_DOWNLOADS", "4")),
+        "source_limits": {
+            "huggingface": int(os.getenv("HF_MAX_CONCURRENT", "3")),
+            "r2": int(os.getenv("R2_MAX_CONCURRENT", "4")),
+            "civitai": int(os.getenv("CIVITAI_MAX_CONCURRENT", "2")),
+        },
+        "part_size_mb": int(os.getenv("DOWNLOAD_PART_SIZE_MB", "64")),
+        "connections": int(os.getenv("DOWNLOAD_CONNECTIONS", "16")),
+        "http_pool_hosts": int(os.getenv("HTTP_POOL_HOSTS", "16")),
+        "http_pool_size": int(os.getenv("HTTP_POOL_SIZE") or 0) or None,
+        "http_retries": int(os.getenv("HTTP_RETRIES", "3")),
+        "http_backoff": float(os.getenv("HTTP_BACKOFF", "1.0")),
+        "state_dir": os.getenv("AICLIPSE_STATE_DIR"),
+        "hash_workers": int(os.getenv("HASH_WORKERS", "2")),
+        "use_store": os.getenv("MODEL_STORE", "true").lower() == "true",
+        "metrics_sink": os.getenv("DOWNLOAD_METRICS"),
+        "metrics_port": int(os.getenv("DOWNLOAD_METRICS_PORT") or 0) or None,
+        "workflows": [p for p in os.getenv("PRIORITY_WORKFLOWS", "").split(os.pathsep) if p],
+        "lazy": os.getenv("LAZY_MODELS", "false").lower() == "true",
+        "cache_budget_gb": (
+            float(os.getenv("MODEL_CACHE_SIZE", "0"))
+            if os.getenv("ENABLE_MODEL_CACHE", "false").lower() == "true"
+            else None
+        ),
+        "cache_policy": os.getenv("MODEL_CACHE_POLICY", "lru").lower(),
+        "peers": [p.strip() for p in os.getenv("PEER_CACHE_URLS", "").split(",") if p.strip()],
+        "lockfile": os.getenv("MODELS_LOCKFILE") or None,
+        "max_mbps": float(os.getenv("DOWNLOAD_MAX_MBPS") or 0) or None,
+        "source_max_mbps": {
+            "huggingface": float(os.getenv("HF_MAX_MBPS") or 0),
+            "r2": float(os.getenv("R2_MAX_MBPS") or 0),
+            "civitai": float(os.getenv("CIVITAI_MAX_MBPS") or 0),
+            "url": float(os.getenv("URL_MAX_MBPS") or 0),
+        },
+        "write_buffer_kb": int(os.getenv("DOWNLOAD_BUFFER_KB", "1024")),
+        "write_back_mb": int(os.getenv("DOWNLOAD_WRITEBACK_MB", "256")),
+        "drop_cache": os.getenv("DOWNLOAD_DROP_CACHE", "true").lower() == "true",
+        "adaptive_io": os.getenv("DOWNLOAD_ADAPTIVE_IO", "true").lower() == "true",
     }
 
     # R2 configuration
@@ -479,6 +3231,8 @@ def load_config():
             "secret_key": r2_secret_key,
             "account_id": r2_account_id,
             "bucket": r2_bucket,  # Optional default bucket
+            # Other S3-compatible stores (MinIO, a local stand-in)
+            "endpoint": os.getenv("R2_ENDPOINT_URL") or None,
         }
         log("🔧 R2 configuration loaded")
 
@@ -493,7 +3247,7 @@ def load_config():
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Enhanced model downloader supporting HuggingFace, Cloudflare R2, and CivitAI",
+        description="Enhanced model downloader supporting HuggingFace, Cloudflare R2, CivitAI and direct URLs",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
@@ -503,6 +3257,20 @@ Examples:
   # Validate manifest only
   python download_models.py --manifest models.txt --models-dir /tmp --validate-only
 
+  # Lint several manifests together and check every entry exists at its source
+  python download_models.py --manifest manifests/base_models.txt \\
+      --manifest templates/qwen-multi-edit/models_manifest.txt --models-dir /tmp --validate-only --remote
+
+  # Download the models the template workflows load first
+  python download_models.py --manifest models.txt --models-dir /workspace/aiclipse/models --workflows /workspace/aiclipse/workflows
+
+  # Pin every entry (URL, revision, size, SHA256), then boot from the pins
+  python download_models.py --manifest models.txt --models-dir /workspace/aiclipse/models --write-lock models.lock
+  python download_models.py --manifest models.txt --models-dir /workspace/aiclipse/models --locked models.lock
+
+  # Show what would be downloaded (sizes, sources, time at 200 MB/s)
+  python download_models.py --manifest models.txt --models-dir /workspace/aiclipse/models --plan --bandwidth 200
+
 Manifest format:
   # Legacy HuggingFace format
   repo_id|filename|subdir[|checksum]
@@ -510,32 +3278,183 @@ Manifest format:
   # Enhanced format with source
   huggingface|repo_id|filename|subdir[|checksum]
   r2|bucket/path/file.ext|filename|subdir[|checksum]
-  civitai|model_id|filename|subdir[|checksum]
+  civitai|version_id|filename|subdir[|checksum]   (or model:<id> / version:<id>)
+  url|https://host/path/file.ext|filename|subdir[|checksum]
 
 Environment variables:
   HF_TOKEN - HuggingFace Hub token
+  HF_ENDPOINT - HuggingFace Hub base URL (default: https://huggingface.co)
   CIVITAI_TOKEN - CivitAI API token
+  CIVITAI_API_BASE - CivitAI API base URL (default: https://civitai.com/api/v1)
+  CIVITAI_CACHE_TTL - Seconds to reuse cached CivitAI model info (default: 86400)
+  VALIDATE_CACHE_TTL - Seconds to reuse --validate-only --remote results (default: 3600)
   R2_ACCESS_KEY_ID - Cloudflare R2 access key
   R2_SECRET_ACCESS_KEY - Cloudflare R2 secret key
   R2_ACCOUNT_ID - Cloudflare R2 account ID
   R2_BUCKET - Default R2 bucket (optional)
+  R2_ENDPOINT_URL - S3 endpoint instead of <account>.r2.cloudflarestorage.com (optional)
+  PARALLEL_DOWNLOADS - Concurrent downloads (default: 4)
+  HF_MAX_CONCURRENT / R2_MAX_CONCURRENT / CIVITAI_MAX_CONCURRENT
+                     - Per-source concurrency limits (default: 3 / 4 / 2)
+  DOWNLOAD_CONNECTIONS - Range connections per file (default: 16)
+  DOWNLOAD_PART_SIZE_MB - Range part size in MB (default: 64)
+  HTTP_POOL_HOSTS - Hosts with a kept-alive connection pool (default: 16)
+  HTTP_POOL_SIZE - Connections kept per host (default: workers x connections)
+  HTTP_RETRIES / HTTP_BACKOFF - Attempts per request and backoff base in seconds (default: 3 / 1.0)
+  AICLIPSE_STATE_DIR - Where caches live (default: parent of --models-dir)
+  HASH_WORKERS - Files hashed in parallel during verification (default: 2)
+  MODEL_STORE - Deduplicate models by SHA256 under <models-dir>/.store (default: true)
+  DOWNLOAD_METRICS - JSON-lines metrics sink: file path, udp://host:port, tcp://host:port
+                     or "off" (default: <state-dir>/logs/models_metrics.jsonl)
+  DOWNLOAD_METRICS_PORT - Serve Prometheus metrics on this port while downloading (default: off)
+  PRIORITY_WORKFLOWS - Colon-separated workflow files/dirs whose models download first
+  LAZY_MODELS - Only download what the workflows need; defer the rest (default: false)
+  ENABLE_MODEL_CACHE / MODEL_CACHE_SIZE - Keep downloaded models within a budget in GB
+                     (0: only when the disk is full), evicting ones the manifest does
+                     not pin (default: false / 0)
+  MODEL_CACHE_POLICY - Eviction order: lru or lfu (default: lru)
+  PEER_CACHE_URLS - Comma-separated peers or mirrors serving /sha256/<digest>
+                    (see peer_cache.py), tried before the upstream source
+  MODELS_LOCKFILE - Lockfile to download from, as with --locked
+  DOWNLOAD_MAX_MBPS - Bandwidth cap for all downloads in MB/s (default: unlimited)
+  HF_MAX_MBPS / R2_MAX_MBPS / CIVITAI_MAX_MBPS / URL_MAX_MBPS
+                     - Per-source bandwidth caps in MB/s (default: unlimited)
+  DOWNLOAD_BUFFER_KB - Read/write buffer per connection in KB (default: 1024)
+  DOWNLOAD_WRITEBACK_MB - Flush downloaded data to disk every N MB per file; 0 flushes
+                     only at the end (default: 256)
+  DOWNLOAD_DROP_CACHE - Drop flushed model data from the page cache (default: true)
+  DOWNLOAD_ADAPTIVE_IO - Slow downloads down while write-back is slower than usual,
+                     i.e. the disk is busy with other work (default: true)
         """,
     )
 
-    parser.add_argument("--manifest", required=True, help="Path to manifest file")
+    parser.add_argument(
+        "--manifest",
+        required=True,
+        action="append",
+        help="Path to manifest file (repeatable with --validate-only)",
+    )
     parser.add_argument("--models-dir", required=True, help="Models download directory")
     parser.add_argument(
-        "--validate-only", action="store_true", help="Only validate manifest syntax"
+        "--validate-only",
+        action="store_true",
+        help="Only validate manifest syntax, duplicates and conflicting targets",
+    )
+    parser.add_argument(
+        "--remote",
+        action="store_true",
+        help="With --validate-only, also check each entry exists at its source and its size and checksum",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Resolve every entry and print a JSON download plan without downloading",
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=100,
+        help="Bandwidth in MB/s used for --plan time estimates (default: 100)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Concurrent downloads (default: PARALLEL_DOWNLOADS or 4)",
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        help="Range connections per file (default: DOWNLOAD_CONNECTIONS or 16)",
+    )
+    parser.add_argument(
+        "--part-size-mb",
+        type=int,
+        help="Range part size in MB (default: DOWNLOAD_PART_SIZE_MB or 64)",
+    )
+    parser.add_argument(
+        "--max-mbps",
+        type=float,
+        help="Bandwidth cap for all downloads in MB/s (default: DOWNLOAD_MAX_MBPS or unlimited)",
+    )
+    parser.add_argument(
+        "--workflows",
+        action="append",
+        help="Workflow file or directory whose models download first (repeatable)",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Download only models the workflows need; leave placeholders for the rest",
+    )
+    parser.add_argument(
+        "--write-lock",
+        metavar="FILE",
+        help="After the run (or with --plan, without downloading) pin every entry in FILE",
+    )
+    parser.add_argument(
+        "--locked",
+        metavar="FILE",
+        help="Download from the resolutions in FILE without metadata requests",
+    )
+    parser.add_argument(
+        "--changes",
+        help="manifest_merge.py report; updated entries are re-fetched even if present",
+    )
+    parser.add_argument(
+        "--peer",
+        action="append",
+        help="Peer or mirror URL serving /sha256/<digest>, tried before upstream (repeatable)",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="JSON-lines metrics sink: path, udp://host:port, tcp://host:port or off",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics on this port (default: DOWNLOAD_METRICS_PORT)",
     )
 
     args = parser.parse_args()
+    if len(args.manifest) > 1 and not args.validate_only:
+        parser.error("--manifest can only be repeated with --validate-only")
+    if args.remote and not args.validate_only:
+        parser.error("--remote requires --validate-only")
 
-    if not os.path.exists(args.manifest):
-        log_error(f"Manifest file not found: {args.manifest}")
-        return 1
+    global LOG_STREAM
+    if args.plan:
+        LOG_STREAM = sys.stderr
+
+    for manifest_file in args.manifest:
+        if not os.path.exists(manifest_file):
+            log_error(f"Manifest file not found: {manifest_file}")
+            return 1
+    manifest = args.manifest[0]
 
     # Load configuration from environment
     config = load_config()
+    if args.workers:
+        config["workers"] = args.workers
+    if args.connections:
+        config["connections"] = args.connections
+    if args.part_size_mb:
+        config["part_size_mb"] = args.part_size_mb
+    if args.max_mbps:
+        config["max_mbps"] = args.max_mbps
+    if args.metrics:
+        config["metrics_sink"] = args.metrics
+    if args.workflows:
+        config["workflows"] = args.workflows
+    if args.lazy:
+        config["lazy"] = True
+    if args.peer:
+        config["peers"] = args.peer
+    if args.changes:
+        config["changes"] = args.changes
+    if args.locked:
+        config["lockfile"] = args.locked
+    if args.metrics_port:
+        config["metrics_port"] = args.metrics_port
 
     # Initialize downloader
     try:
@@ -546,31 +3465,50 @@ Environment variables:
 
     # Validate only mode
     if args.validate_only:
-        log("🔍 Validating manifest syntax...")
-
-        with open(args.manifest, "r", encoding="utf-8") as f:
-            valid = True
-            line_count = 0
-
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-
-                line_count += 1
-                if not downloader.parse_manifest_line(line, line_num):
-                    valid = False
-
-        if valid:
-            log(f"✅ Manifest validation passed ({line_count} valid entries)")
+        what = "syntax and sources" if args.remote else "syntax"
+        log(f"🔍 Validating manifest {what} ({len(args.manifest)} file(s))...")
+        started = time.monotonic()
+        report = downloader.validate_manifests(args.manifest, remote=args.remote)
+
+        for level, manifest_file, line_num, message in report["issues"]:
+            if level == "error":
+                log_error(f"❌ {manifest_file}:{line_num}: {message}")
+            else:
+                log(f"⚠️ {manifest_file}:{line_num}: {message}")
+        for manifest_file, size in report["sizes"].items():
+            log(f"📦 {manifest_file}: {size / 1024**3:.2f} GB")
+
+        errors = sum(1 for issue in report["issues"] if issue[0] == "error")
+        warnings = len(report["issues"]) - errors
+        elapsed = time.monotonic() - started
+        if not errors:
+            log(
+                f"✅ Manifest validation passed ({report['entries']} valid entries, "
+                f"{warnings} warnings, {elapsed:.1f}s)"
+            )
             return 0
         else:
-            log_error("❌ Manifest validation failed")
+            log_error(f"❌ Manifest validation failed ({errors} errors, {warnings} warnings)")
+            return 1
+
+    # Plan mode: metadata only, machine-readable output on stdout
+    if args.plan:
+        try:
+            plan = downloader.plan_manifest(manifest, args.bandwidth, args.write_lock)
+        except Exception as e:
+            log_error(f"Planning failed: {e}")
             return 1
+        print(json.dumps(plan, indent=2))
+        summary = plan["summary"]
+        log(
+            f"📐 Plan: {summary['download_bytes']:,} bytes to download, "
+            f"~{summary['estimated_seconds']:.0f}s at {args.bandwidth:g} MB/s ({summary['statuses']})"
+        )
+        return 0 if "error" not in summary["statuses"] and not summary["invalid_lines"] else 1
 
     # Process manifest
     try:
-        success = downloader.process_manifest(args.manifest)
+        success = downloader.process_manifest(manifest, args.write_lock)
         return 0 if success else 1
     except KeyboardInterrupt:
         log_error("\n🛑 Download interrupted by user")
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Custom node installer: parallel clones, one dependency resolve
+
+Nodes listed in the nodes manifest are cloned in parallel. The requirements
+of every node are then merged into a single file and installed in one
+resolver pass (uv when available, else pip), with the package cache kept on
+/workspace so wheels survive pod restarts. If that combined install fails,
+nodes are installed one by one so a single broken node does not block the
+rest. install.py scripts run afterwards, one at a time.
+
+What was installed is recorded inside the target venv (a fresh container
+has a fresh venv, so nothing is skipped there). A node whose commit and
+requirements hash match the record is skipped; if every node matches, no
+resolver pass runs at all.
+
+Manifest format:
+  repo_url|branch|category|description
+
+Usage:
+  python install_nodes.py --manifest /workspace/custom_nodes_manifest.txt \\
+      --nodes-dir /workspace/aiclipse/ComfyUI/custom_nodes
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Requirement options that apply to the whole install, not one package
+GLOBAL_OPTIONS = ("--index-url", "-i", "--extra-index-url", "--find-links", "-f")
+# Options whose argument is a path relative to the requirements file
+FILE_OPTIONS = ("-r", "--requirement", "-c", "--constraint", "-e", "--editable")
+
+
+def log(message):
+    print(f"[NODES] {message}", flush=True)
+
+
+def log_error(message):
+    print(f"[NODES ERROR] {message}", flush=True, file=sys.stderr)
+
+
+def parse_manifest(manifest_file):
+    """[{"name", "repo", "branch"}] in manifest order, duplicates dropped"""
+    nodes = {}
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = [part.strip() for part in line.split("|")]
+            if not fields[0]:
+                continue
+            repo = fields[0]
+            name = repo.rstrip("/").rsplit("/", 1)[-1]
+            name = name[:-4] if name.endswith(".git") else name
+            branch = fields[1] if len(fields) > 1 and fields[1] else None
+            nodes[name] = {"name": name, "repo": repo, "branch": branch}
+    return list(nodes.values())
+
+
+def git(*args, cwd=None):
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    return subprocess.run(
+        ["git", *args], cwd=cwd, env=env, capture_output=True, text=True
+    )
+
+
+def clone_node(node, nodes_dir):
+    """Clone the node if missing; returns its HEAD commit or raises"""
+    path = Path(nodes_dir) / node["name"]
+    if not path.is_dir():
+        log(f"⬇️ Cloning {node['name']}...")
+        result = git("clone", "--depth", "1", "-b", node["branch"] or "main", node["repo"], str(path))
+        if result.returncode != 0 and not node["branch"]:
+            # No branch in the manifest: fall back to the repo's default
+            shutil.rmtree(path, ignore_errors=True)
+            result = git("clone", "--depth", "1", node["repo"], str(path))
+        if result.returncode != 0:
+            shutil.rmtree(path, ignore_errors=True)
+            error = result.stderr.strip().splitlines()
+            raise Exception(error[-1] if error else "git clone failed")
+        log(f"✨ Cloned {node['name']}")
+    result = git("rev-parse", "HEAD", cwd=path)
+    # Nodes copied in by hand may not be git checkouts
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def requirement_lines(requirements_file, seen=None):
+    """Normalized lines of a requirements file, with nested -r files inlined
+    and relative paths made absolute so the lines can be merged"""
+    requirements_file = Path(requirements_file).resolve()
+    seen = seen if seen is not None else set()
+    if requirements_file in seen:
+        return []
+    seen.add(requirements_file)
+
+    lines = []
+    with open(requirements_file, "r", encoding="utf-8") as f:
+        for raw in f:
+            line = raw.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            option, _, value = line.partition(" ")
+            if "=" in option and option.startswith("--"):
+                option, value = option.split("=", 1)
+            value = value.strip()
+            if option in ("-r", "--requirement"):
+                lines.extend(requirement_lines(requirements_file.parent / value, seen))
+            elif option in FILE_OPTIONS:
+                if not value.startswith(("git+", "http://", "https://")):
+                    value = str((requirements_file.parent / value).resolve())
+                lines.append(f"{option} {value}")
+            elif line.startswith((".", "/")):
+                lines.append(str((requirements_file.parent / line).resolve()))
+            else:
+                lines.append(line)
+    return lines
+
+
+def requirements_hash(node_path):
+    requirements_file = Path(node_path) / "requirements.txt"
+    if not requirements_file.is_file():
+        return None
+    return hashlib.sha256("\n".join(requirement_lines(requirements_file)).encode()).hexdigest()
+
+
+def merge_requirements(node_paths):
+    """One requirements text for all nodes: global options first, then each
+    distinct requirement once. Conflicting pins are left to the resolver."""
+    options, requirements = [], []
+    for node_path in node_paths:
+        requirements_file = Path(node_path) / "requirements.txt"
+        if not requirements_file.is_file():
+            continue
+        for line in requirement_lines(requirements_file):
+            target = options if line.split(" ", 1)[0].split("=", 1)[0] in GLOBAL_OPTIONS else requirements
+            if line not in target:
+                target.append(line)
+    return "\n".join(options + requirements) + "\n"
+
+
+class NodeInstaller:
+    def __init__(self, nodes_dir, python="/venv/bin/python", workers=10, cache_dir=None, state_file=None):
+        self.nodes_dir = Path(nodes_dir)
+        self.nodes_dir.mkdir(parents=True, exist_ok=True)
+        self.python = python
+        self.workers = max(1, workers)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        # Kept in the venv: installed packages live and die with it
+        venv = Path(python).parent.parent
+        self.state_file = Path(state_file) if state_file else venv / "aiclipse-nodes.json"
+        self.state = self._load_state()
+        self.uv = shutil.which("uv", path=str(Path(python).parent)) or shutil.which("uv")
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f).get("nodes", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save_state(self):
+        tmp_file = self.state_file.with_name(self.state_file.name + ".tmp")
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"python": self.python, "nodes": self.state}, f, indent=1, sort_keys=True)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            log_error(f"Could not save install state to {self.state_file}: {e}")
+
+    def _env(self):
+        env = dict(os.environ)
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            env["UV_CACHE_DIR"] = str(self.cache_dir / "uv")
+            env["PIP_CACHE_DIR"] = str(self.cache_dir / "pip")
+            # The cache is on the volume, the venv is not: hardlinks can't cross
+            env.setdefault("UV_LINK_MODE", "copy")
+        return env
+
+    def pip_install(self, requirements_file):
+        if self.uv:
+            command = [self.uv, "pip", "install", "--python", self.python, "-r", str(requirements_file)]
+        else:
+            command = [self.python, "-m", "pip", "install", "-r", str(requirements_file)]
+        result = subprocess.run(command, env=self._env(), capture_output=True, text=True)
+        if result.returncode != 0:
+            tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+            raise Exception(tail or f"exit code {result.returncode}")
+
+    def run_install_script(self, node_path):
+        result = subprocess.run(
+            [self.python, "install.py"], cwd=node_path, env=self._env(), capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise Exception(f"install.py exited with {result.returncode}")
+
+    def install(self, nodes, force=False):
+        """Install every node; returns the names of nodes that failed"""
+        failed = []
+        log(f"🚀 Cloning {len(nodes)} nodes ({self.workers} at a time)...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            commits = dict(zip([n["name"] for n in nodes], pool.map(self._clone, nodes)))
+
+        ready, changed = [], []
+        for node in nodes:
+            name = node["name"]
+            commit = commits[name]
+            if commit is False:
+                failed.append(name)
+                continue
+            path = self.nodes_dir / name
+            node.update(path=path, commit=commit, requirements=requirements_hash(path))
+            ready.append(node)
+            previous = self.state.get(name, {})
+            if (
+                force
+                or name not in self.state
+                or previous.get("commit") != commit
+                or previous.get("requirements") != node["requirements"]
+            ):
+                changed.append(node)
+
+        unchanged = len(ready) - len(changed)
+        if not changed:
+            log(f"✅ All {unchanged} nodes unchanged since the last install, skipping dependencies")
+            return failed
+        log(f"📦 {len(changed)} nodes new or changed, {unchanged} unchanged")
+
+        installed = self._install_requirements(ready, changed, failed)
+        for node in changed:
+            if node["name"] not in installed:
+                continue
+            # A requirements-only change does not re-run install.py
+            previous = self.state.get(node["name"], {})
+            rerun = force or "commit" not in previous or previous["commit"] != node["commit"]
+            if rerun and (node["path"] / "install.py").is_file():
+                log(f"🔧 Running install script for {node['name']}...")
+                try:
+                    self.run_install_script(node["path"])
+                except Exception as e:
+                    log_error(f"{node['name']}: {e}")
+                    failed.append(node["name"])
+                    continue
+            self.state[node["name"]] = {
+                "repo": node["repo"],
+                "commit": node["commit"],
+                "requirements": node["requirements"],
+            }
+        self._save_state()
+        return failed
+
+    def _clone(self, node):
+        try:
+            return clone_node(node, self.nodes_dir)
+        except Exception as e:
+            log_error(f"Failed to clone {node['name']}: {e}")
+            return False
+
+    def _install_requirements(self, ready, changed, failed):
+        """Names of changed nodes whose requirements are installed"""
+        with_requirements = [n for n in ready if n["requirements"]]
+        names = {n["name"] for n in changed}
+        if not with_requirements:
+            return names
+
+        # Every node goes into the resolve, so changed ones are checked
+        # against the pins of the others
+        combined = (self.cache_dir or self.nodes_dir) / "node_requirements.txt"
+        combined.parent.mkdir(parents=True, exist_ok=True)
+        combined.write_text(merge_requirements(n["path"] for n in with_requirements), encoding="utf-8")
+        log(f"📦 Installing requirements of {len(with_requirements)} nodes in one pass...")
+        try:
+            self.pip_install(combined)
+            return names
+        except Exception as e:
+            log_error(f"Combined install failed, installing nodes one by one:\n{e}")
+
+        for node in changed:
+            if not node["requirements"]:
+                continue
+            try:
+                self.pip_install(node["path"] / "requirements.txt")
+            except Exception as e:
+                log_error(f"{node['name']}: {e}")
+                failed.append(node["name"])
+                names.discard(node["name"])
+        return names
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Install ComfyUI custom nodes from a manifest",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Environment variables:
+  NODE_INSTALL_WORKERS - Parallel clones (default: 10)
+  NODE_WHEEL_CACHE - Persistent uv/pip cache (default: /workspace/aiclipse/cache/pip)
+        """,
+    )
+    parser.add_argument("--manifest", required=True, help="Nodes manifest")
+    parser.add_argument("--nodes-dir", required=True, help="ComfyUI custom_nodes directory")
+    parser.add_argument("--python", default="/venv/bin/python", help="Interpreter of the target venv")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("NODE_INSTALL_WORKERS") or 10),
+        help="Parallel clones (default: NODE_INSTALL_WORKERS or 10)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.getenv("NODE_WHEEL_CACHE", "/workspace/aiclipse/cache/pip"),
+        help="Persistent package cache (default: NODE_WHEEL_CACHE)",
+    )
+    parser.add_argument("--state", help="Install record (default: <venv>/aiclipse-nodes.json)")
+    parser.add_argument("--force", action="store_true", help="Reinstall every node")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        log_error(f"Nodes manifest not found: {args.manifest}")
+        return 1
+
+    nodes = parse_manifest(args.manifest)
+    if not nodes:
+        log("No custom nodes in the manifest")
+        return 0
+
+    installer = NodeInstaller(
+        args.nodes_dir,
+        python=args.python,
+        workers=args.workers,
+        cache_dir=args.cache_dir or None,
+        state_file=args.state,
+    )
+    failed = installer.install(nodes, force=args.force)
+    if failed:
+        log_error(f"❌ {len(failed)} nodes failed: {', '.join(failed)}")
+        return 1
+    log(f"✅ {len(nodes)} custom nodes ready")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+On-demand fetcher for models deferred by download_models.py --lazy
+
+--lazy leaves a zero-byte placeholder for every model no workflow needs and
+records it in <state-dir>/lazy_index.json. This daemon materializes them on
+first use; fetched models stay on disk (and in the index, for eviction).
+
+Triggers:
+  HTTP   curl -X POST localhost:8190/fetch/loras/style.safetensors
+         curl -X POST 'localhost:8190/fetch/style.safetensors?wait=0'
+         curl localhost:8190/models
+  Watch  ComfyUI opening a placeholder starts its download (needs
+         inotifywait); queue the prompt again once the model has landed
+
+Usage:
+  python lazy_models.py --models-dir /workspace/aiclipse/models [--port 8190]
+"""
+
+import argparse
+import http.server
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+from download_models import (
+    EnhancedModelDownloader,
+    LazyIndex,
+    load_config,
+    log,
+    log_error,
+    model_present,
+)
+
+
+class LazyModelServer:
+    """Fetches indexed models on request, one download per model at a time"""
+
+    def __init__(self, downloader, workers=2):
+        self.downloader = downloader
+        self.index = downloader.lazy_index
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, key):
+        """Future resolving to True once the model is on disk"""
+        with self._lock:
+            future = self._futures.get(key)
+            if future and not future.done():
+                return future
+            if model_present(self.index.models[key]["target"]):
+                future = Future()
+                future.set_result(True)
+                return future
+            future = self.pool.submit(self._materialize, key)
+            self._futures[key] = future
+            return future
+
+    def _materialize(self, key):
+        entry = dict(self.index.models[key])
+        model_info = {field: entry[field] for field in LazyIndex.MANIFEST_FIELDS}
+        self.index.update(key, state="fetching")
+        log(f"📥 Fetching on demand: {key}")
+
+        try:
+            ok = bool(self.downloader.download_model(model_info))
+        except Exception as e:
+            log_error(f"On-demand fetch of {key} failed: {e}")
+            ok = False
+
+        if ok:
+            self.downloader.cache.record(entry["target"])
+            now = time.time()
+            self.index.update(
+                key, state="fetched", fetched_at=now, last_used=now, uses=entry.get("uses", 0) + 1
+            )
+            log(f"📌 {key} is now local")
+        else:
+            # Keep the model visible in ComfyUI so it can be requested again
+            Path(entry["target"]).touch()
+            self.index.update(key, state="failed")
+        return ok
+
+    def touch(self, key):
+        """Record a use of a fetched model (for LRU/LFU eviction)"""
+        uses = self.index.models[key].get("uses", 0)
+        self.index.update(key, last_used=time.time(), uses=uses + 1)
+        self.downloader.cache.touch(self.index.models[key]["target"])
+
+    def on_open(self, path):
+        key = self.index.key_for_path(path)
+        if not key:
+            self.downloader.cache.touch(path)
+            return
+        state = self.index.models[key]["state"]
+        if state == "fetching":
+            return
+        if model_present(path):
+            if state == "fetched":
+                self.touch(key)
+            return
+        log(f"👀 {key} was opened while still a placeholder")
+        self.fetch(key)
+
+    def watch(self, models_dir):
+        """Follow opens under models_dir until inotifywait exits"""
+        command = [
+            "inotifywait", "-m", "-r", "-q",
+            "-e", "open",
+            "--format", "%w%f",
+            "--exclude", r"(/\.store/|\.part$|\.part\.json$|\.link$)",
+            str(models_dir),
+        ]
+        with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as proc:
+            for line in proc.stdout:
+                try:
+                    self.on_open(line.rstrip("\n"))
+                except Exception as e:
+                    log_error(f"Watch: {e}")
+
+    def status(self):
+        return {
+            key: dict(entry, present=model_present(entry["target"]))
+            for key, entry in self.index.models.items()
+        }
+
+    def serve(self, host, port):
+        server = self
+
+        class LazyHandler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, payload):
+                body = json.dumps(payload, indent=2).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.rstrip("/") == "/models":
+                    self._reply(200, server.status())
+                elif url.path.startswith("/fetch/"):
+                    self._fetch(url)
+                else:
+                    self._reply(404, {"error": "unknown endpoint"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path.startswith("/fetch/"):
+                    self._fetch(url)
+                else:
+                    self._reply(404, {"error": "unknown endpoint"})
+
+            def _fetch(self, url):
+                name = unquote(url.path[len("/fetch/"):])
+                key = server.index.lookup(name)
+                if not key:
+                    self._reply(404, {"error": f"{name} is not in the lazy index"})
+                    return
+                future = server.fetch(key)
+                if parse_qs(url.query).get("wait", ["1"])[0] in ("0", "false"):
+                    self._reply(202, {"model": key, "state": server.index.models[key]["state"]})
+                    return
+                ok = future.result()
+                self._reply(200 if ok else 502, {"model": key, "state": server.index.models[key]["state"]})
+
+        httpd = http.server.ThreadingHTTPServer((host, port), LazyHandler)
+        log(f"💤 Lazy model server on http://{host}:{port} ({len(self.index.models)} models indexed)")
+        httpd.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fetch models deferred by download_models.py --lazy on first use",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Environment variables:
+  LAZY_MODELS_PORT - HTTP trigger port (default: 8190)
+  Downloader settings (tokens, R2, connections, ...) as for download_models.py
+        """,
+    )
+    parser.add_argument("--models-dir", required=True, help="Models directory")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("LAZY_MODELS_PORT", "8190")),
+        help="HTTP trigger port (default: LAZY_MODELS_PORT or 8190)",
+    )
+    parser.add_argument(
+        "--no-watch", action="store_true", help="Only fetch on HTTP requests"
+    )
+    args = parser.parse_args()
+
+    config = load_config()
+    try:
+        downloader = EnhancedModelDownloader(args.models_dir, **config)
+    except Exception as e:
+        log_error(f"Failed to initialize downloader: {e}")
+        return 1
+    server = LazyModelServer(downloader, workers=config["workers"])
+
+    if not args.no_watch:
+        if shutil.which("inotifywait"):
+            threading.Thread(target=server.watch, args=(args.models_dir,), daemon=True).start()
+            log(f"👀 Watching {args.models_dir} for placeholder opens")
+        else:
+            log_error("inotifywait not found; only the HTTP trigger is available")
+
+    try:
+        server.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        return 130
+    except OSError as e:
+        log_error(f"Lazy model server failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
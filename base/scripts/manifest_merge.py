@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Merge a template model manifest into the workspace manifest
+
+Both files are parsed once and keyed by (subdir, filename). Template
+entries are added or replace the workspace entry with the same key in
+place; entries an earlier template added but the current one dropped are
+removed. Everything else in the workspace manifest (user entries,
+comments, order) is kept. The result is written atomically, and only if
+it changed.
+
+The applied template is remembered in a state file next to the manifest,
+which is how removals are told apart from entries the user added.
+
+Usage:
+  python manifest_merge.py --template /manifests/flux_models.txt \\
+      --manifest /workspace/aiclipse/models_manifest.txt \\
+      [--report /workspace/aiclipse/manifest_changes.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+SOURCES = ("r2", "cloudflare", "civitai", "huggingface", "hf", "url", "direct")
+
+
+def log(message):
+    print(f"[MANIFEST] {message}", flush=True)
+
+
+def log_error(message):
+    print(f"[MANIFEST ERROR] {message}", flush=True, file=sys.stderr)
+
+
+def parse_entry(line):
+    """(key, fields) for a manifest line, or None for comments/invalid lines.
+
+    key is (subdir, filename); fields are the stripped columns, so
+    whitespace-only differences do not count as updates.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    fields = tuple(part.strip() for part in line.split("|"))
+    if fields[0].lower() in SOURCES:
+        if len(fields) < 4:
+            return None
+        key = (fields[3], fields[2])
+    else:
+        # Legacy HuggingFace format: repo_id|filename|subdir[|checksum]
+        if len(fields) < 3:
+            return None
+        key = (fields[2], fields[1])
+    # An empty trailing checksum column is the same entry
+    while fields and not fields[-1]:
+        fields = fields[:-1]
+    return key, fields
+
+
+def entry_name(key):
+    return f"{key[0]}/{key[1]}"
+
+
+def read_text(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def merge(workspace_lines, template_lines, previous_template=None):
+    """Return (merged_lines, changes).
+
+    previous_template is the set of keys the last applied template
+    contributed; those missing from this template are removed.
+    """
+    template = {}
+    for line in template_lines:
+        parsed = parse_entry(line)
+        if parsed:
+            # Last one wins, like the old append-based merge
+            template[parsed[0]] = (parsed[1], line.strip())
+
+    changes = {"added": [], "updated": [], "removed": [], "duplicates": [], "unchanged": 0}
+    stale = set(previous_template or ()) - set(template)
+    merged = []
+    seen = set()
+    for line in workspace_lines:
+        parsed = parse_entry(line)
+        if not parsed:
+            merged.append(line)
+            continue
+        key, fields = parsed
+        if key in seen:
+            changes["duplicates"].append(entry_name(key))
+            continue
+        seen.add(key)
+        if key in template:
+            template_fields, template_line = template[key]
+            if fields == template_fields:
+                changes["unchanged"] += 1
+                merged.append(line)
+            else:
+                changes["updated"].append(entry_name(key))
+                merged.append(template_line)
+        elif key in stale:
+            changes["removed"].append(entry_name(key))
+        else:
+            merged.append(line)
+
+    for key, (_fields, template_line) in template.items():
+        if key not in seen:
+            changes["added"].append(entry_name(key))
+            merged.append(template_line)
+
+    return merged, changes
+
+
+def write_atomic(path, text):
+    path = Path(path)
+    tmp_file = path.with_name(path.name + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_file, path)
+
+
+def merge_files(template_file, manifest_file, state_file=None):
+    """Merge template_file into manifest_file in place; returns the changes"""
+    manifest_file = Path(manifest_file)
+    state_file = Path(state_file or manifest_file.with_name(f".{manifest_file.name}.template.json"))
+
+    previous = []
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            previous = [tuple(key) for key in json.load(f).get("keys", [])]
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    template_lines = (read_text(template_file) or "").splitlines()
+    original = read_text(manifest_file)
+    merged, changes = merge((original or "").splitlines(), template_lines, previous)
+
+    text = "\n".join(merged) + "\n" if merged else ""
+    if text != original:
+        write_atomic(manifest_file, text)
+
+    keys = sorted({parsed[0] for parsed in map(parse_entry, template_lines) if parsed})
+    write_atomic(state_file, json.dumps({"template": str(template_file), "keys": keys}, indent=1))
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge a template model manifest into the workspace manifest"
+    )
+    parser.add_argument("--template", required=True, help="Template manifest to apply")
+    parser.add_argument("--manifest", required=True, help="Workspace manifest (updated in place)")
+    parser.add_argument("--state", help="Where the applied template is remembered")
+    parser.add_argument("--report", help="Write added/updated/removed entries here as JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.template):
+        log_error(f"Template manifest not found: {args.template}")
+        return 1
+
+    try:
+        changes = merge_files(args.template, args.manifest, args.state)
+    except OSError as e:
+        log_error(f"Merge failed: {e}")
+        return 1
+
+    labels = {"added": "➕ Added", "updated": "🔄 Updated", "removed": "➖ Removed", "duplicates": "🧹 Dropped duplicate"}
+    for kind, label in labels.items():
+        for name in changes[kind]:
+            log(f"{label}: {name}")
+    log(
+        f"📋 Merged {args.template}: {len(changes['added'])} added, {len(changes['updated'])} updated, "
+        f"{len(changes['removed'])} removed, {changes['unchanged']} unchanged"
+    )
+
+    if args.report:
+        write_atomic(args.report, json.dumps(changes, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Peer model cache: serve verified models to other pods on the LAN
+
+Each pod running this exposes the models it has already verified, addressed
+by SHA256, so pods scaled from the same template copy from each other
+instead of all pulling the same files upstream:
+
+  GET  /sha256/<digest>   model bytes (Range requests supported)
+  HEAD /sha256/<digest>   200 if available, 404 otherwise
+  GET  /health
+
+Blobs come from the model store (<models-dir>/.store); with MODEL_STORE=false
+any file whose digest is in the checksum cache is served instead. Clients
+(download_models.py with PEER_CACHE_URLS) re-hash what they receive, so a
+bad peer can only cost time. A static mirror with the same /sha256/<digest>
+layout works as a peer too.
+
+Usage:
+  python peer_cache.py --models-dir /workspace/aiclipse/models [--port 8191]
+"""
+
+import argparse
+import http.server
+import os
+import re
+import sys
+from pathlib import Path
+
+from download_models import ChecksumCache, ModelStore, log, log_error
+from range_server import send_file_range, send_range_headers
+
+DIGEST_PATH = re.compile(r"^/sha256/([0-9a-fA-F]{64})$")
+
+
+class PeerCache:
+    """Looks up verified files by SHA256"""
+
+    def __init__(self, models_dir, state_dir):
+        self.store = ModelStore(Path(models_dir) / ".store")
+        self.cache_file = Path(state_dir) / "checksum_cache.json"
+        self._cache = None
+        self._cache_mtime = None
+
+    def _checksum_cache(self):
+        # Downloads keep updating the cache file; reload when it changes
+        try:
+            mtime = self.cache_file.stat().st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._cache_mtime:
+            self._cache = ChecksumCache(self.cache_file)
+            self._cache_mtime = mtime
+        return self._cache
+
+    def locate(self, digest):
+        blob = self.store.blob_path(digest)
+        if blob.is_file():
+            return blob
+        cache = self._checksum_cache()
+        path = cache.find(digest) if cache else None
+        return Path(path) if path else None
+
+
+def make_handler(peer_cache):
+    class PeerCacheHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _empty(self, code):
+            self.send_response(code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_HEAD(self):
+            self._serve(send_body=False)
+
+        def do_GET(self):
+            if self.path == "/health":
+                body = b"ok\n"
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self._serve(send_body=True)
+
+        def _serve(self, send_body):
+            match = DIGEST_PATH.match(self.path)
+            path = peer_cache.locate(match.group(1).lower()) if match else None
+            if not path:
+                self._empty(404)
+                return
+
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                byte_range = send_range_headers(self, size, {"ETag": f'"{match.group(1).lower()}"'})
+                if byte_range and send_body:
+                    send_file_range(self, f, *byte_range)
+
+    return PeerCacheHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve verified models to other pods by SHA256",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Environment variables:
+  PEER_CACHE_PORT - Listen port (default: 8191)
+  AICLIPSE_STATE_DIR - Where the checksum cache lives (default: parent of --models-dir)
+        """,
+    )
+    parser.add_argument("--models-dir", required=True, help="Models directory")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address (default: 0.0.0.0)")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("PEER_CACHE_PORT", "8191")),
+        help="Listen port (default: PEER_CACHE_PORT or 8191)",
+    )
+    args = parser.parse_args()
+
+    state_dir = os.getenv("AICLIPSE_STATE_DIR") or Path(args.models_dir).resolve().parent
+    peer_cache = PeerCache(args.models_dir, state_dir)
+    try:
+        server = http.server.ThreadingHTTPServer((args.host, args.port), make_handler(peer_cache))
+    except OSError as e:
+        log_error(f"Peer cache failed to start: {e}")
+        return 1
+
+    log(f"🤝 Peer cache serving {args.models_dir} on http://{args.host}:{args.port}/sha256/<digest>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
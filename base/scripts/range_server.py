@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+HTTP Range handling shared by every file server in the repo
+
+peer_cache.py serves model bytes to other pods, and the benchmarks'
+stand-in upstreams (benchmarks/fake_upstream.py, bench_verify.py) serve
+synthetic files to the downloader. All of them answer Range requests the
+same way through these helpers:
+
+  bytes=a-b    206 with a..min(b, size - 1)
+  bytes=a-     206 with a..size - 1
+  bytes=-n     206 with the last n bytes
+  a past the end, or bytes=-0
+               416 with Content-Range: bytes */size
+  no Range, an invalid one (a > b), or an empty file
+               200 with the whole file (RFC 7233 section 3.1)
+
+Usage (inside a BaseHTTPRequestHandler):
+  byte_range = send_range_headers(self, size, {"ETag": etag})
+  if byte_range and send_body:
+      send_file_range(self, f, *byte_range)
+"""
+
+import re
+
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """(start, end, status) for a Range header against a size-byte file;
+    end is inclusive and status is 200, 206 or 416"""
+    match = RANGE_HEADER.match(header or "")
+    if not match or not size:
+        return 0, size - 1, 200
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and start > int(last):
+            # Not a valid byte-range-spec, so the header is ignored
+            return 0, size - 1, 200
+        if start >= size:
+            return start, size - 1, 416
+        end = min(int(last or size - 1), size - 1)
+    elif last:
+        if not int(last):
+            return size, size - 1, 416
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        return 0, size - 1, 200
+    return start, end, 206
+
+
+def send_range_headers(handler, size, headers=None):
+    """Send the status line and headers for handler's Range request.
+
+    Returns the inclusive (start, end) to send, or None when the range
+    is not satisfiable (the 416 has been sent already).
+    """
+    start, end, status = parse_range(handler.headers.get("Range"), size)
+    if status == 416:
+        handler.send_response(416)
+        handler.send_header("Content-Range", f"bytes */{size}")
+        handler.send_header("Content-Length", "0")
+        handler.end_headers()
+        return None
+
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/octet-stream")
+    handler.send_header("Content-Length", str(end - start + 1))
+    handler.send_header("Accept-Ranges", "bytes")
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    if status == 206:
+        handler.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+    handler.end_headers()
+    return start, end
+
+
+def send_file_range(handler, f, start, end):
+    """Body for send_range_headers(): bytes start..end of the open file f"""
+    if end < start:
+        return
+    handler.wfile.flush()
+    # Kernel-side copy straight from the page cache
+    handler.connection.sendfile(f, offset=start, count=end - start + 1)
@@ -1,5 +1,5 @@
 #!/bin/bash
-# Enhanced Model Setup Script with Aria2c Parallel Downloads
+# Enhanced Model Setup Script - all sources handled by download_models.py
 
 setup_model_paths() {
     log_info "Configuring ComfyUI model paths..."
@@ -69,213 +69,117 @@ setup_manifest() {
     fi
 
     # Always merge template manifest if available (to ensure required models are present)
-
-    # Smart Merge: Update existing entries based on FILENAME
+    # Keyed by subdir/filename; entries a previous template added but this
+    # one dropped are removed, user-added entries are kept
     local template_manifest="/manifests/${TEMPLATE_TYPE}_models.txt"
+    rm -f "/workspace/aiclipse/manifest_changes.json"
     if [ -f "$template_manifest" ]; then
         log_info "Merging template manifest: ${TEMPLATE_TYPE}"
-        while IFS= read -r line || [ -n "$line" ]; do
-            [[ $line =~ ^[[:space:]]*# ]] && continue
-            [[ -z "$line" ]] && continue
-            
-            # Extract filename (3rd field)
-            local filename=$(echo "$line" | cut -d'|' -f3 | xargs)
-            
-            # Get existing entries for this filename
-            local existing_entries=$(grep "|${filename}|" "$manifest_file" || true)
-            
-            if [ -n "$existing_entries" ]; then
-                # If existing entries do not exactly match the single new line
-                # This handles duplicates or incorrect URLs
-                if [ "$existing_entries" != "$line" ]; then
-                    log_info "🔄 Updating manifest entry for $filename"
-                    
-                    # Escape special chars for sed
-                    local escaped_filename=$(echo "$filename" | sed 's/[#]/\\#/g')
-                    
-                    # Delete ALL lines matching this filename
-                    sed -i "/|${escaped_filename}|/d" "$manifest_file"
-                    
-                    # Append the correct line
-                    echo "$line" >> "$manifest_file"
-                fi
-            else
-                # New entry, append
-                echo "$line" >> "$manifest_file"
-            fi
-        done < "$template_manifest"
+        if ! /venv/bin/python /scripts/manifest_merge.py \
+            --template "$template_manifest" \
+            --manifest "$manifest_file" \
+            --report "/workspace/aiclipse/manifest_changes.json"; then
+            log_warn "Manifest merge failed - using the workspace manifest as is"
+        fi
     fi
     
     return 0
 }
 
-generate_aria2_input() {
-    local manifest_file="$1"
-    local input_file="$2"
-    
-    rm -f "$input_file"
-    
-    while IFS= read -r line || [ -n "$line" ]; do
-        # Skip comments and empty lines
-        [[ $line =~ ^[[:space:]]*# ]] && continue
-        [[ -z "$line" ]] && continue
-        
-        # Parse line: source|identifier|filename|subdir[|checksum]
-        IFS='|' read -r source identifier filename subdir checksum <<< "$line"
-        
-        source=$(echo "$source" | tr '[:upper:]' '[:lower:]' | xargs)
-        identifier=$(echo "$identifier" | xargs)
-        filename=$(echo "$filename" | xargs)
-        subdir=$(echo "$subdir" | xargs)
-        
-        local url=""
-        local header=""
-        
-        case "$source" in
-            "huggingface"|"hf")
-                url="https://huggingface.co/${identifier}/resolve/main/${filename}"
-                if [ -n "$HF_TOKEN" ]; then
-                    header="Authorization: Bearer $HF_TOKEN"
-                fi
-                ;;
-            "civitai")
-                url="https://civitai.com/api/download/models/${identifier}"
-                if [ -n "$CIVITAI_TOKEN" ]; then
-                    header="Authorization: Bearer $CIVITAI_TOKEN"
-                fi
-                ;;
-            "url"|"direct")
-                url="$identifier"
-                ;;
-            *)
-                log_warn "Unknown source: $source for $filename"
-                continue
-                ;;
-        esac
-        
-        if [ -n "$url" ]; then
-            echo "$url" >> "$input_file"
-            echo "  out=$filename" >> "$input_file"
-            echo "  dir=/workspace/aiclipse/models/$subdir" >> "$input_file"
-            if [ -n "$header" ]; then
-                echo "  header=$header" >> "$input_file"
-            fi
-        fi
-        
-    done < "$manifest_file"
-}
-
 download_models_enhanced() {
     local manifest_file="/workspace/aiclipse/models_manifest.txt"
-    local aria2_input="/workspace/aiclipse/aria2_input.txt"
-    local python_manifest="/workspace/aiclipse/python_manifest.txt"
-    
+
     if [ "$DOWNLOAD_MODELS" != "true" ]; then
         log_info "Model downloads disabled (DOWNLOAD_MODELS=false)"
         return 0
     fi
-    
+
     if ! setup_manifest; then
         return 0
     fi
-    
-    log_info "Generating download lists..."
-    
-    # Clear previous lists
-    rm -f "$aria2_input" "$python_manifest"
-    touch "$aria2_input" "$python_manifest"
-    
-    # Split downloads between Aria2 and Python script
-    while IFS= read -r line || [ -n "$line" ]; do
-        # Skip comments and empty lines
-        [[ $line =~ ^[[:space:]]*# ]] && continue
-        [[ -z "$line" ]] && continue
-        
-        # Parse line: source|identifier|filename|subdir[|checksum]
-        IFS='|' read -r source identifier filename subdir checksum <<< "$line"
-        
-        source=$(echo "$source" | tr '[:upper:]' '[:lower:]' | xargs)
-        identifier=$(echo "$identifier" | xargs)
-        filename=$(echo "$filename" | xargs)
-        subdir=$(echo "$subdir" | xargs)
-        
-        local url=""
-        local header=""
-        local use_aria2=false
-        
-        case "$source" in
-            "huggingface"|"hf")
-                url="https://huggingface.co/${identifier}/resolve/main/${filename}"
-                if [ -n "$HF_TOKEN" ]; then
-                    header="Authorization: Bearer $HF_TOKEN"
-                fi
-                use_aria2=true
-                ;;
-            "civitai")
-                url="https://civitai.com/api/download/models/${identifier}"
-                if [ -n "$CIVITAI_TOKEN" ]; then
-                    header="Authorization: Bearer $CIVITAI_TOKEN"
-                fi
-                use_aria2=true
-                ;;
-            "url"|"direct")
-                url="$identifier"
-                use_aria2=true
-                ;;
-            "r2"|"cloudflare")
-                # R2 goes to python script
-                echo "$line" >> "$python_manifest"
-                continue
-                ;;
-            *)
-                # Unknown sources go to python script as fallback
-                echo "$line" >> "$python_manifest"
-                continue
-                ;;
-        esac
-        
-        if [ "$use_aria2" = "true" ] && [ -n "$url" ]; then
-            echo "$url" >> "$aria2_input"
-            echo "  out=$filename" >> "$aria2_input"
-            echo "  dir=/workspace/aiclipse/models/$subdir" >> "$aria2_input"
-            if [ -n "$header" ]; then
-                echo "  header=$header" >> "$aria2_input"
-            fi
-        fi
-        
-    done < "$manifest_file"
-    
-    # 1. Run Aria2 downloads
-    if [ -s "$aria2_input" ]; then
-        log_info "🔥 Starting high-performance parallel downloads (Aria2)..."
-        if aria2c -i "$aria2_input" \
-            -x 16 -s 16 -j 10 \
-            -c --auto-file-renaming=false \
-            --console-log-level=warn \
-            --summary-interval=30; then
-            log_success "Aria2 downloads completed"
-        else
-            log_error "Some Aria2 downloads failed"
+
+    # Models the synced workflows load go first; each workflow gets a
+    # /workspace/aiclipse/ready/<name>.ready marker once it can run
+    local workflow_args=()
+    if [ -d "/workspace/aiclipse/workflows" ]; then
+        workflow_args=(--workflows "/workspace/aiclipse/workflows")
+    fi
+
+    # Entries the merge changed are re-fetched even if a file is present
+    local change_args=()
+    if [ -f "/workspace/aiclipse/manifest_changes.json" ]; then
+        change_args=(--changes "/workspace/aiclipse/manifest_changes.json")
+    fi
+
+    # MODELS_LOCKFILE: boot from pinned resolutions (read by download_models.py),
+    # then refresh the lock with anything the manifest added since
+    local lock_args=()
+    if [ -n "$MODELS_LOCKFILE" ]; then
+        lock_args=(--write-lock "$MODELS_LOCKFILE")
+    fi
+
+    # Downloads yield CPU and disk time to ComfyUI loading models from the
+    # same volume (DOWNLOAD_LOW_PRIORITY=false to run at normal priority)
+    local priority_cmd=()
+    if [ "${DOWNLOAD_LOW_PRIORITY:-true}" = "true" ]; then
+        priority_cmd=(nice -n 10)
+        if command -v ionice > /dev/null; then
+            priority_cmd+=(ionice -c 2 -n 7)
         fi
+    fi
+
+    # One pass over the manifest: HF, URL, CivitAI and R2 transfers share a
+    # single scheduler, and every file is checksum-verified when possible
+    log_info "🔥 Starting model downloads (HF/URL/CivitAI/R2)..."
+    if "${priority_cmd[@]}" /venv/bin/python /scripts/download_models.py --manifest "$manifest_file" --models-dir "/workspace/aiclipse/models" "${workflow_args[@]}" "${change_args[@]}" "${lock_args[@]}"; then
+        log_success "Model downloads completed"
     else
-        log_info "No standard downloads found for Aria2."
+        log_error "Some model downloads failed"
     fi
-    
-    # 2. Run Python downloads (R2, etc)
-    if [ -s "$python_manifest" ]; then
-        log_info "🐍 Starting specialized downloads (R2/Python)..."
-        if /venv/bin/python /scripts/download_models.py --manifest "$python_manifest" --models-dir "/workspace/aiclipse/models"; then
-            log_success "Python downloads completed"
-        else
-            log_error "Some Python downloads failed"
-        fi
+
+    # WARM_MODELS=true: read the models the workflows load into the page
+    # cache so ComfyUI's first load does not come cold off the volume
+    if [ "${WARM_MODELS:-false}" = "true" ] && [ ${#workflow_args[@]} -gt 0 ]; then
+        log_info "♨️ Warming workflow models into the page cache..."
+        /venv/bin/python /scripts/warm_models.py --models-dir "/workspace/aiclipse/models" "${workflow_args[@]}" \
+            || log_warn "Model warm-up failed"
     fi
-    
-    # Cleanup
-    rm -f "$aria2_input" "$python_manifest"
+
+    # LAZY_MODELS=true left placeholders for everything the workflows do not
+    # need; fetch those on first use instead of at boot
+    if [ "${LAZY_MODELS:-false}" = "true" ]; then
+        start_lazy_models
+    fi
+}
+
+start_lazy_models() {
+    if pgrep -f "lazy_models.py" > /dev/null; then
+        log_info "Lazy model server already running"
+        return 0
+    fi
+    log_info "💤 Starting lazy model server on port ${LAZY_MODELS_PORT:-8190}..."
+    mkdir -p /workspace/aiclipse/logs
+    nohup /venv/bin/python /scripts/lazy_models.py --models-dir "/workspace/aiclipse/models" \
+        > /workspace/aiclipse/logs/lazy_models.log 2>&1 &
+}
+
+start_peer_cache() {
+    if pgrep -f "peer_cache.py" > /dev/null; then
+        log_info "Peer cache already running"
+        return 0
+    fi
+    log_info "🤝 Serving verified models to peers on port ${PEER_CACHE_PORT:-8191}..."
+    mkdir -p /workspace/aiclipse/logs
+    nohup /venv/bin/python /scripts/peer_cache.py --models-dir "/workspace/aiclipse/models" \
+        > /workspace/aiclipse/logs/peer_cache.log 2>&1 &
 }
 
 download_models_async() {
+    # Serve what this pod already has before it starts pulling the rest
+    if [ "${PEER_CACHE_SERVE:-false}" = "true" ]; then
+        start_peer_cache
+    fi
+
     if [ "$DOWNLOAD_IN_FOREGROUND" = "true" ]; then
         download_models_enhanced
     else
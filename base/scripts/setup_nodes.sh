@@ -1,39 +1,5 @@
 #!/bin/bash
 
-install_node() {
-    local repo_url="$1"
-    local branch="$2"
-    local nodes_dir="$3"
-    
-    local node_name=$(basename "$repo_url" .git)
-    local node_path="$nodes_dir/$node_name"
-    
-    if [ ! -d "$node_path" ]; then
-        echo "⬇️ Cloning $node_name..."
-        if ! git clone --depth 1 -b "${branch:-main}" "$repo_url" "$node_path"; then
-            echo "❌ Failed to clone $node_name"
-            return 1
-        fi
-        echo "✨ Cloned $node_name"
-    else
-        echo "✅ $node_name already exists"
-    fi
-
-    # Always check for requirements
-    if [ -f "$node_path/requirements.txt" ]; then
-        # Check if we need to install (simple check: are packages installed?)
-        # For now, just install to be safe (uv is fast)
-        echo "📦 Verifying reqs for $node_name..."
-        /venv/bin/uv pip install --python /venv/bin/python -r "$node_path/requirements.txt" >/dev/null 2>&1
-    fi
-    
-    if [ -f "$node_path/install.py" ]; then
-        echo "🔧 Running install script for $node_name..."
-        cd "$node_path" && /venv/bin/python install.py >/dev/null 2>&1
-    fi
-}
-export -f install_node
-
 setup_custom_nodes() {
     log_info "🔌 Setting up custom nodes..."
     
@@ -85,23 +51,14 @@ setup_custom_nodes() {
         return 0
     fi
     
-    log_info "🚀 Installing nodes in parallel (Max 10)..."
-    
-    # Prepare input list for xargs
-    # Format: repo_url branch nodes_dir
-    local input_list=""
-    while IFS= read -r line || [ -n "$line" ]; do
-        [[ $line =~ ^[[:space:]]*# ]] && continue
-        [[ -z "$line" ]] && continue
-        
-        IFS='|' read -r repo_url branch category <<< "$line"
-        repo_url=$(echo "$repo_url" | xargs)
-        branch=$(echo "$branch" | xargs)
-        
-        if [ -n "$repo_url" ]; then
-            echo "$repo_url ${branch:-main} $nodes_dir"
-        fi
-    done < "$nodes_manifest" | xargs -P 10 -n 3 bash -c 'install_node "$@"' _ || log_warn "Some nodes failed to install, but continuing..."
-    
+    # Parallel clones, then one resolver pass over every node's requirements
+    # with the package cache on /workspace; unchanged nodes are skipped
+    log_info "🚀 Installing nodes in parallel (Max ${NODE_INSTALL_WORKERS:-10})..."
+    /venv/bin/python /scripts/install_nodes.py \
+        --manifest "$nodes_manifest" \
+        --nodes-dir "$nodes_dir" \
+        --python /venv/bin/python \
+        || log_warn "Some nodes failed to install, but continuing..."
+
     log_success "Custom nodes installation complete"
 }
@@ -53,13 +53,17 @@ sync_workflows_to_comfyui() {
     # Create workspace workflows directory
     mkdir -p /workspace/aiclipse/workflows
 
-    # Step 1: Sync template workflows to workspace
+    # Step 1: Sync template workflows to workspace. sync_workflows.py keeps
+    # content hashes, so only new or changed files are copied and edited
+    # workflows are kept unless FORCE_WORKFLOW_RESET=true. --adopt takes over
+    # files the old rsync wrote, which have no record yet
     if [ -d "/opt/workflows" ]; then
         log_info "📋 Syncing template workflows to workspace..."
-        rsync -av /opt/workflows/ /workspace/aiclipse/workflows/
-
-        local workflow_count=$(find /workspace/aiclipse/workflows -name "*.json" -type f | wc -l)
-        log_info "✅ Synced $workflow_count workflow(s) from template"
+        /venv/bin/python /scripts/sync_workflows.py \
+            --source /opt/workflows \
+            --dest /workspace/aiclipse/workflows \
+            --adopt \
+            || log_warn "Some template workflows failed to sync"
     else
         log_info "ℹ️ No template workflows found in /opt/workflows"
     fi
@@ -68,21 +72,15 @@ sync_workflows_to_comfyui() {
     local comfy_user_workflows="$COMFY_DIR/user/default/workflows"
     mkdir -p "$comfy_user_workflows"
 
-    # Step 3: Copy workflows to ComfyUI's expected location
     # Step 3: Copy workflows to ComfyUI's expected location
     if [ -d "/workspace/aiclipse/workflows" ]; then
         log_info "🎯 Copying workflows to ComfyUI user directory..."
-        
-        if [ "$FORCE_WORKFLOW_RESET" = "true" ]; then
-            log_warn "FORCE_WORKFLOW_RESET is true - Overwriting existing workflows!"
-            find /workspace/aiclipse/workflows -name "*.json" -type f -exec cp -f {} "$comfy_user_workflows/" \;
-        else
-            # Use -n to not overwrite existing files (preserves user edits)
-            find /workspace/aiclipse/workflows -name "*.json" -type f -exec cp -n {} "$comfy_user_workflows/" \;
-        fi
-
-        local copied_count=$(find "$comfy_user_workflows" -name "*.json" -type f | wc -l)
-        log_info "✅ Copied/Verified $copied_count workflow(s) in ComfyUI user directory"
+        /venv/bin/python /scripts/sync_workflows.py \
+            --source /workspace/aiclipse/workflows \
+            --dest "$comfy_user_workflows" \
+            --pattern "*.json" \
+            --flatten \
+            || log_warn "Some workflows failed to copy to ComfyUI"
     fi
 
     # Step 4: Configure Custom Scripts extension if available
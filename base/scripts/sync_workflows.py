@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Copy workflows into place, only when something changed
+
+Every file synced is recorded in a state file with the SHA256 of what was
+written and the (size, mtime) it had afterwards. On the next boot:
+
+  - a destination file that is missing is copied
+  - a destination still matching the record is updated if the source
+    changed, and left alone otherwise
+  - a destination that differs from the record was edited by the user and
+    is kept, unless --force (FORCE_WORKFLOW_RESET=true)
+  - a destination with no record yet (a workspace from before this tool)
+    is replaced with --adopt, as the old rsync did, and recorded from then
+    on; without --adopt it is kept, as the old cp -n did
+
+Files are only hashed when their size or mtime changed since the last run,
+so an unchanged boot reads no workflow contents. Copies are written to a
+temporary file and renamed into place, a batch at a time.
+
+Usage:
+  python sync_workflows.py --source /opt/workflows --dest /workspace/aiclipse/workflows
+  python sync_workflows.py --source /workspace/aiclipse/workflows \\
+      --dest /workspace/ComfyUI/user/default/workflows --pattern '*.json' --flatten
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def log(message):
+    print(f"[WORKFLOWS] {message}", flush=True)
+
+
+def log_error(message):
+    print(f"[WORKFLOWS ERROR] {message}", flush=True, file=sys.stderr)
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class WorkflowSync:
+    """Plans and applies one source -> destination sync"""
+
+    def __init__(self, state_file, workers=8):
+        self.state_file = Path(state_file)
+        self.workers = max(1, workers)
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        self.state.setdefault("sources", {})
+        self.state.setdefault("files", {})
+
+    def _source_hash(self, path):
+        # Template files rarely change: reuse the hash while size/mtime match
+        key = str(path)
+        cached = self.state["sources"].get(key)
+        current = fingerprint(path)
+        if cached and cached["fingerprint"] == current:
+            return cached["sha256"]
+        digest = hash_file(path)
+        self.state["sources"][key] = {"fingerprint": current, "sha256": digest}
+        return digest
+
+    def _dest_hash(self, path, record):
+        if record and record.get("fingerprint") == fingerprint(path):
+            return record["sha256"]
+        return hash_file(path)
+
+    def plan(self, source, dest, pattern="*", flatten=False, force=False, adopt=False):
+        """[(action, source_file, dest_file, sha256)] for every source file;
+        action is copy, update, keep (user edit) or skip (up to date).
+
+        adopt treats destination files without a record as earlier copies
+        of the source, so they are updated rather than kept.
+        """
+        source, dest = Path(source), Path(dest)
+        actions = {}
+        for source_file in sorted(source.rglob(pattern)):
+            if not source_file.is_file():
+                continue
+            relative = source_file.name if flatten else source_file.relative_to(source)
+            dest_file = dest / relative
+            digest = self._source_hash(source_file)
+            record = self.state["files"].get(str(dest_file))
+
+            if not dest_file.exists():
+                action = "copy"
+            else:
+                current = self._dest_hash(dest_file, record)
+                if current == digest:
+                    action = "skip"
+                elif force:
+                    action = "update"
+                elif record and current == record["sha256"]:
+                    # Still what we wrote last time: safe to replace
+                    action = "update"
+                elif not record and adopt:
+                    # Nothing proves it was edited; only a record can
+                    action = "update"
+                else:
+                    action = "keep"
+            # Flattened names can collide; the last one wins, as with cp
+            actions[dest_file] = (action, source_file, dest_file, digest)
+        return list(actions.values())
+
+    @staticmethod
+    def _copy(source_file, dest_file):
+        dest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = dest_file.with_name(f".{dest_file.name}.tmp")
+        with open(source_file, "rb") as src, open(tmp_file, "wb") as dst:
+            dst.write(src.read())
+        os.replace(tmp_file, dest_file)
+
+    def apply(self, plan):
+        """Copy what the plan says; returns the number of failures"""
+        writes = [(s, d, digest) for action, s, d, digest in plan if action in ("copy", "update")]
+        failures = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = pool.map(lambda item: self._try_copy(*item[:2]), writes)
+            for (source_file, dest_file, digest), error in zip(writes, results):
+                if error:
+                    log_error(f"Failed to copy {source_file} -> {dest_file}: {error}")
+                    failures += 1
+                    continue
+                self.state["files"][str(dest_file)] = {
+                    "sha256": digest,
+                    "fingerprint": fingerprint(dest_file),
+                }
+        for action, _source_file, dest_file, digest in plan:
+            if action == "skip":
+                self.state["files"][str(dest_file)] = {
+                    "sha256": digest,
+                    "fingerprint": fingerprint(dest_file),
+                }
+        return failures
+
+    def _try_copy(self, source_file, dest_file):
+        try:
+            self._copy(source_file, dest_file)
+            return None
+        except OSError as e:
+            return e
+
+    def save(self):
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_name(self.state_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.state_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Copy new or changed workflows, preserving user edits",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Environment variables:
+  FORCE_WORKFLOW_RESET - Overwrite user-edited workflows (same as --force)
+  AICLIPSE_STATE_DIR - Where the sync state lives (default: /workspace/aiclipse)
+        """,
+    )
+    parser.add_argument("--source", required=True, help="Directory to copy from")
+    parser.add_argument("--dest", required=True, help="Directory to copy into")
+    parser.add_argument("--pattern", default="*", help="Files to sync (default: all)")
+    parser.add_argument(
+        "--flatten", action="store_true", help="Copy files from subdirectories into --dest itself"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        default=os.getenv("FORCE_WORKFLOW_RESET", "false").lower() == "true",
+        help="Overwrite files the user edited (default: FORCE_WORKFLOW_RESET)",
+    )
+    parser.add_argument(
+        "--adopt",
+        action="store_true",
+        help="Replace destination files synced before state was kept (e.g. by rsync)",
+    )
+    parser.add_argument("--state", help="Sync state file (default: <state-dir>/workflow_sync.json)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source):
+        log(f"ℹ️ No workflows in {args.source}")
+        return 0
+
+    state_dir = os.getenv("AICLIPSE_STATE_DIR", "/workspace/aiclipse")
+    sync = WorkflowSync(args.state or Path(state_dir) / "workflow_sync.json")
+    if args.force:
+        log("⚠️ FORCE_WORKFLOW_RESET is set - overwriting edited workflows")
+
+    try:
+        plan = sync.plan(args.source, args.dest, args.pattern, args.flatten, args.force, args.adopt)
+    except OSError as e:
+        log_error(f"Cannot read workflows: {e}")
+        return 1
+
+    for action, _source_file, dest_file, _digest in plan:
+        if action == "keep":
+            log(f"✋ Keeping user-edited {dest_file.name}")
+    failures = sync.apply(plan)
+    try:
+        sync.save()
+    except OSError as e:
+        log_error(f"Could not save sync state: {e}")
+
+    counts = {action: sum(1 for step in plan if step[0] == action) for action in ("copy", "update", "keep", "skip")}
+    log(
+        f"✅ {args.source} -> {args.dest}: {counts['copy']} new, {counts['update']} updated, "
+        f"{counts['keep']} kept, {counts['skip']} unchanged"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
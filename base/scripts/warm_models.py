@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Warm the page cache with the models the default workflows load
+
+ComfyUI's first load of a large UNet otherwise reads it cold from the
+network volume. This reads the models the workflows reference ahead of
+time, within a memory budget, so that first load comes from RAM.
+
+For .safetensors files the header is parsed for the tensor offsets and
+only the tensor data region is prefetched (and a truncated file is
+reported instead of warmed); other formats are prefetched whole. Models
+are warmed in workflow order, the ones most workflows share first, until
+the budget is used up.
+
+Methods:
+  read     parallel large preads (default; works on network filesystems
+           that ignore readahead hints)
+  fadvise  POSIX_FADV_WILLNEED, asynchronous
+  mmap     madvise(MADV_WILLNEED) on a read-only mapping
+
+Residency before and after is measured with mincore(2) and written with
+the timings to <state-dir>/warm_report.json.
+
+Usage:
+  python warm_models.py --models-dir /workspace/aiclipse/models \\
+      --workflows /workspace/aiclipse/workflows [--budget-gb 48]
+"""
+
+import argparse
+import ctypes
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from workflow_models import MODEL_EXTENSIONS, load_workflow_references
+
+READ_SIZE = 16 * 1024 * 1024
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def log(message):
+    print(f"[WARM] {message}", flush=True)
+
+
+def log_error(message):
+    print(f"[WARM ERROR] {message}", flush=True, file=sys.stderr)
+
+
+def safetensors_data_range(path):
+    """(start, end) of the tensor data in a .safetensors file.
+
+    The file is an 8-byte little-endian header length, a JSON header
+    mapping tensor names to data_offsets relative to the end of the
+    header, then the tensor data.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        if header_len > min(size - 8, 100 * 1024 * 1024):
+            raise ValueError("header length is out of range")
+        header = json.loads(f.read(header_len))
+    base = 8 + header_len
+    offsets = [
+        tensor["data_offsets"]
+        for name, tensor in header.items()
+        if name != "__metadata__"
+    ]
+    if not offsets:
+        return base, base
+    end = base + max(stop for _start, stop in offsets)
+    if end > size:
+        raise ValueError(f"truncated: tensors end at byte {end:,} of {size:,}")
+    return base + min(start for start, _stop in offsets), end
+
+
+def data_range(path):
+    if path.suffix.lower() in (".safetensors", ".sft"):
+        return safetensors_data_range(path)
+    return 0, os.path.getsize(path)
+
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            libc.mmap.restype = ctypes.c_void_p
+            libc.mmap.argtypes = [
+                ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long
+            ]
+            libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc
+
+
+def resident_bytes(path, start=0, end=None):
+    """Bytes of [start, end) in the page cache, or None if unknown"""
+    libc = _load_libc()
+    size = os.path.getsize(path)
+    end = size if end is None else end
+    if not libc or end <= start:
+        return None if not libc else 0
+    offset = start - start % PAGE_SIZE
+    length = end - offset
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        addr = libc.mmap(None, length, mmap.PROT_READ, mmap.MAP_SHARED, fd, offset)
+        if addr in (None, ctypes.c_void_p(-1).value):
+            return None
+        try:
+            pages = (length + PAGE_SIZE - 1) // PAGE_SIZE
+            vec = (ctypes.c_ubyte * pages)()
+            if libc.mincore(addr, length, vec) != 0:
+                return None
+            return min(sum(b & 1 for b in vec) * PAGE_SIZE, end - start)
+        finally:
+            libc.munmap(addr, length)
+    finally:
+        os.close(fd)
+
+
+class ModelWarmer:
+    def __init__(self, models_dir, budget_bytes, method="read", threads=8):
+        self.models_dir = Path(models_dir)
+        self.budget_bytes = budget_bytes
+        self.method = method
+        self.threads = max(1, threads)
+        self._files = None
+
+    def find(self, name):
+        """Model file for a workflow reference (by basename)"""
+        if self._files is None:
+            self._files = {}
+            for path in sorted(self.models_dir.rglob("*")):
+                if ".store" in path.parts or not path.name.lower().endswith(MODEL_EXTENSIONS):
+                    continue
+                # Zero-byte files are lazy placeholders, not models
+                if path.is_file() and path.stat().st_size > 0:
+                    self._files.setdefault(path.name, path)
+        return self._files.get(name)
+
+    def plan(self, workflows):
+        """Model paths in warm order: shared by most workflows first, then
+        in workflow order"""
+        counts, order = {}, []
+        for refs in workflows.values():
+            for name in sorted(refs):
+                if name not in counts:
+                    order.append(name)
+                counts[name] = counts.get(name, 0) + 1
+        order.sort(key=lambda name: -counts[name])
+        paths = []
+        for name in order:
+            path = self.find(name)
+            if path and path not in paths:
+                paths.append(path)
+        return paths
+
+    def _prefetch_read(self, path, start, end):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            def read(offset):
+                buffer = bytearray(min(READ_SIZE, end - offset))
+                return os.preadv(fd, [buffer], offset)
+
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                return sum(pool.map(read, range(start, end, READ_SIZE)))
+        finally:
+            os.close(fd)
+
+    def _prefetch_fadvise(self, path, start, end):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, start, end - start, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+        return end - start
+
+    def _prefetch_mmap(self, path, start, end):
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                aligned = start - start % mmap.ALLOCATIONGRANULARITY
+                mapped.madvise(mmap.MADV_WILLNEED, aligned, end - aligned)
+        return end - start
+
+    def warm(self, paths):
+        """Prefetch paths in order within the budget; returns per-file results"""
+        prefetch = {
+            "read": self._prefetch_read,
+            "fadvise": self._prefetch_fadvise,
+            "mmap": self._prefetch_mmap,
+        }[self.method]
+        remaining = self.budget_bytes
+        results = []
+        for path in paths:
+            entry = {"model": str(path.relative_to(self.models_dir)), "size": path.stat().st_size}
+            try:
+                start, end = data_range(path)
+            except (OSError, ValueError, struct.error) as e:
+                log_error(f"Skipping {path.name}: {e}")
+                results.append(dict(entry, status="invalid", error=str(e)))
+                continue
+
+            length = end - start
+            before = resident_bytes(path, start, end)
+            entry.update(bytes=length, resident_before=before)
+            if length > remaining:
+                log(f"⏭️ {path.name} ({length / 1024**3:.1f} GB) does not fit the remaining budget")
+                results.append(dict(entry, status="over_budget"))
+                continue
+            remaining -= length
+
+            started = time.monotonic()
+            if before is not None and before >= length:
+                entry["status"] = "resident"
+            else:
+                prefetch(path, start, end)
+                entry["status"] = "warmed"
+            elapsed = time.monotonic() - started
+            after = resident_bytes(path, start, end)
+            entry.update(seconds=round(elapsed, 3), resident_after=after)
+            resident = f", {after / length:.0%} resident" if after is not None and length else ""
+            rate = f" at {length / 1024**2 / elapsed:.0f} MB/s" if elapsed > 0.01 else ""
+            log(f"🔥 {entry['status'].capitalize()} {path.name}: {length / 1024**3:.2f} GB in {elapsed:.1f}s{rate}{resident}")
+            results.append(entry)
+        return results
+
+
+def default_budget():
+    """Half of the memory the page cache can use: MemAvailable, capped by
+    the container's cgroup limit (page cache counts against it)"""
+    available = None
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        current = int(Path("/sys/fs/cgroup/memory.current").read_text())
+        if limit != "max":
+            headroom = int(limit) - current
+            available = min(available, headroom) if available else headroom
+    except (OSError, ValueError):
+        pass
+    return max(0, (available or 0) // 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Prefetch the models the default workflows load into the page cache",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Environment variables:
+  WARM_MODELS_BUDGET_GB - Page cache to fill at most, in GB (default: half of available memory)
+  WARM_MODELS_METHOD - read, fadvise or mmap (default: read)
+  PRIORITY_WORKFLOWS - Colon-separated workflow files/dirs, if --workflows is not given
+  AICLIPSE_STATE_DIR - Where warm_report.json goes (default: parent of --models-dir)
+        """,
+    )
+    parser.add_argument("--models-dir", required=True, help="Models directory")
+    parser.add_argument(
+        "--workflows", action="append", help="Workflow file or directory (repeatable)"
+    )
+    parser.add_argument(
+        "--budget-gb",
+        type=float,
+        default=float(os.getenv("WARM_MODELS_BUDGET_GB") or 0),
+        help="Page cache budget in GB (default: WARM_MODELS_BUDGET_GB or half of available memory)",
+    )
+    parser.add_argument(
+        "--method",
+        choices=("read", "fadvise", "mmap"),
+        default=os.getenv("WARM_MODELS_METHOD", "read"),
+        help="How to prefetch (default: WARM_MODELS_METHOD or read)",
+    )
+    parser.add_argument("--threads", type=int, default=8, help="Parallel reads per file (default: 8)")
+    parser.add_argument("--report", help="Report path (default: <state-dir>/warm_report.json)")
+    args = parser.parse_args()
+
+    workflow_paths = args.workflows or [
+        p for p in os.getenv("PRIORITY_WORKFLOWS", "").split(os.pathsep) if p
+    ]
+    workflows = load_workflow_references(workflow_paths)
+    if not workflows:
+        log("No workflows found, nothing to warm")
+        return 0
+
+    budget = int(args.budget_gb * 1024**3) if args.budget_gb else default_budget()
+    warmer = ModelWarmer(args.models_dir, budget, args.method, args.threads)
+    paths = warmer.plan(workflows)
+    log(
+        f"♨️ Warming {len(paths)} models from {len(workflows)} workflows "
+        f"(budget {budget / 1024**3:.1f} GB, {args.method})"
+    )
+
+    started = time.monotonic()
+    results = warmer.warm(paths)
+    elapsed = time.monotonic() - started
+    warmed = sum(r.get("bytes", 0) for r in results if r["status"] in ("warmed", "resident"))
+    log(f"✅ {warmed / 1024**3:.2f} GB warm in {elapsed:.1f}s")
+
+    state_dir = Path(os.getenv("AICLIPSE_STATE_DIR") or Path(args.models_dir).resolve().parent)
+    report_file = Path(args.report) if args.report else state_dir / "warm_report.json"
+    report = {
+        "method": args.method,
+        "budget_bytes": budget,
+        "seconds": round(elapsed, 3),
+        "warm_bytes": warmed,
+        "models": results,
+    }
+    try:
+        report_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = report_file.with_name(report_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_file, report_file)
+    except OSError as e:
+        log_error(f"Could not write {report_file}: {e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Model references in ComfyUI workflows
+
+Reads both workflow formats ComfyUI produces:
+  UI  - {"nodes": [{"type": ..., "widgets_values": [...]}], "definitions": {"subgraphs": [...]}}
+  API - {"<id>": {"class_type": ..., "inputs": {...}}}
+
+Usage:
+  python workflow_models.py /workspace/aiclipse/workflows
+"""
+
+import json
+import sys
+from pathlib import Path
+
+MODEL_EXTENSIONS = (
+    ".safetensors",
+    ".sft",
+    ".ckpt",
+    ".pt",
+    ".pth",
+    ".bin",
+    ".gguf",
+    ".onnx",
+)
+
+# UI node modes that keep a node out of the executed graph
+MUTED_MODES = (2, 4)
+
+
+def _iter_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _iter_strings(item)
+
+
+def _iter_nodes(workflow):
+    """Yield (node_type, widget values) for every active node"""
+    if isinstance(workflow.get("nodes"), list):
+        graphs = [workflow] + list(workflow.get("definitions", {}).get("subgraphs", []))
+        for graph in graphs:
+            for node in graph.get("nodes", []):
+                if node.get("mode") in MUTED_MODES:
+                    continue
+                yield node.get("type"), node.get("widgets_values")
+        return
+
+    for node in workflow.values():
+        if isinstance(node, dict) and "class_type" in node:
+            yield node["class_type"], node.get("inputs")
+
+
+def model_references(workflow):
+    """Model filenames (basenames) referenced by loader widgets"""
+    refs = set()
+    for _node_type, values in _iter_nodes(workflow):
+        for value in _iter_strings(values):
+            # ComfyUI lists files in model subfolders as "sub/dir/name.ext"
+            name = value.replace("\\", "/").rsplit("/", 1)[-1]
+            if name.lower().endswith(MODEL_EXTENSIONS):
+                refs.add(name)
+    return refs
+
+
+def find_workflows(paths):
+    """Workflow JSON files under the given files or directories"""
+    found = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            found.extend(sorted(path.rglob("*.json")))
+        elif path.is_file():
+            found.append(path)
+    return found
+
+
+def load_workflow_references(paths):
+    """Map workflow name -> referenced model filenames; unreadable files are skipped"""
+    workflows = {}
+    for path in find_workflows(paths):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                workflow = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(workflow, dict):
+            workflows[path.stem] = model_references(workflow)
+    return workflows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    for name, refs in sorted(load_workflow_references(sys.argv[1:]).items()):
+        print(f"{name}: {', '.join(sorted(refs)) or '-'}")
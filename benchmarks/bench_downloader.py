@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+End-to-end downloader benchmark against local stand-in servers
+
+Every entry of the given manifests is backed by a synthetic file of
+--size-mb on fake_upstream.py servers (HF, CivitAI API, S3/R2 and plain
+URLs), and download_models.py is run as it is at boot, once per fault
+scenario:
+
+  clean     no faults
+  latency   100 ms before every response
+  capped    20 MB/s per connection
+  flaky     5% of bodies dropped, 10% of requests answered 429/503
+
+Reported per scenario:
+  cold_s              empty models dir to all files verified
+  warm_s              second run with everything already on disk
+  throughput_mbps     payload MB per cold second
+  redownloaded_mb     body bytes served beyond the payload (resumes, retries)
+  cpu_s_per_gb        downloader CPU time (user + sys) per GB of payload
+
+Results are appended to a history file together with the git commit. A
+run whose cold time or CPU per GB is more than --threshold worse than the
+median of earlier runs with the same parameters is flagged as a
+regression (and fails with --fail-on-regression).
+
+Usage:
+  python benchmarks/bench_downloader.py
+  python benchmarks/bench_downloader.py --manifest templates/qwen-multi-edit/models_manifest.txt \\
+      --scenario flaky --size-mb 64 --set DOWNLOAD_PART_SIZE_MB=16
+"""
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "base" / "scripts"))
+
+from fake_upstream import FakeUpstream  # noqa: E402
+from manifest_merge import SOURCES  # noqa: E402
+
+SCENARIOS = {
+    "clean": {},
+    "latency": {"latency_ms": 100},
+    "capped": {"rate_mbps": 20},
+    "flaky": {"drop_rate": 0.05, "error_rate": 0.10},
+}
+
+DEFAULT_MANIFESTS = ["manifests/base_models.txt", *sorted(
+    str(p.relative_to(ROOT)) for p in ROOT.glob("templates/*/models_manifest.txt")
+)]
+
+# Settings that would point the downloader at real services or state
+ISOLATED_ENV = (
+    "HF_TOKEN", "CIVITAI_TOKEN", "CIVITAI_API_KEY", "PEER_CACHE_URLS", "MODELS_LOCKFILE",
+    "PRIORITY_WORKFLOWS", "LAZY_MODELS", "DOWNLOAD_METRICS_PORT", "R2_BUCKET",
+)
+
+
+def parse_entries(manifest_file):
+    """(source, identifier, filename, subdir) for every valid manifest line"""
+    entries = []
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = [part.strip() for part in line.split("|")]
+            if fields[0].lower() in SOURCES and len(fields) >= 4:
+                entries.append((fields[0].lower(), fields[1], fields[2], fields[3]))
+            elif fields[0].lower() not in SOURCES and len(fields) >= 3:
+                entries.append(("huggingface", fields[0], fields[1], fields[2]))
+    return entries
+
+
+def stage_manifest(entries, upstream, size, out_file):
+    """Register every entry on the fake upstream and write the manifest
+    download_models.py will see (URLs rewritten to the stand-in)"""
+    lines = []
+    for source, identifier, filename, subdir in entries:
+        if source in ("huggingface", "hf"):
+            upstream.add_huggingface(identifier, filename, size)
+        elif source == "civitai":
+            model_id = identifier.rpartition(":")[2]
+            if filename.lower() in ("auto", "latest") or filename.startswith("."):
+                name = f"model_{model_id}{filename if filename.startswith('.') else '.safetensors'}"
+            else:
+                name = filename
+            upstream.add_civitai(model_id, name, size)
+        elif source in ("r2", "cloudflare"):
+            upstream.add_s3("models", identifier, size)
+        else:
+            identifier, _digest = upstream.add_url(identifier, size)
+        # No manifest checksum: verification uses what the source publishes
+        lines.append(f"{source}|{identifier}|{filename}|{subdir}")
+    out_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return len(lines)
+
+
+def run_downloader(manifest_file, models_dir, env):
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, str(ROOT / "base" / "scripts" / "download_models.py"),
+         "--manifest", str(manifest_file), "--models-dir", str(models_dir)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return result, elapsed, cpu
+
+
+def run_scenario(name, manifest, args):
+    entries = parse_entries(ROOT / manifest)
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory(prefix="bench-dl-") as tmp:
+        tmp = Path(tmp)
+        upstream = FakeUpstream(tmp / "blobs", SCENARIOS[name], seed=args.seed).start()
+        try:
+            count = stage_manifest(entries, upstream, size, tmp / "manifest.txt")
+            payload = count * size
+            env = {k: v for k, v in os.environ.items() if k not in ISOLATED_ENV}
+            env.update(
+                HF_ENDPOINT=upstream.url,
+                CIVITAI_API_BASE=f"{upstream.url}/api/v1",
+                R2_ACCESS_KEY_ID="bench",
+                R2_SECRET_ACCESS_KEY="bench",
+                R2_ACCOUNT_ID="bench",
+                R2_BUCKET="models",
+                R2_ENDPOINT_URL=upstream.url,
+                AICLIPSE_STATE_DIR=str(tmp / "state"),
+                DOWNLOAD_METRICS=str(tmp / "state" / "metrics.jsonl"),
+            )
+            env.update(args.settings)
+
+            cold, cold_s, cpu_s = run_downloader(tmp / "manifest.txt", tmp / "models", env)
+            served = upstream.counters["body_bytes"]
+            warm, warm_s, _ = run_downloader(tmp / "manifest.txt", tmp / "models", env)
+            counters = dict(upstream.counters)
+        finally:
+            upstream.stop()
+
+    if cold.returncode != 0 and args.verbose:
+        sys.stderr.write(cold.stdout[-4000:] + cold.stderr[-4000:])
+    return {
+        "scenario": name,
+        "manifest": manifest,
+        "files": count,
+        "ok": cold.returncode == 0 and warm.returncode == 0,
+        "cold_s": round(cold_s, 3),
+        "warm_s": round(warm_s, 3),
+        "throughput_mbps": round(payload / (1024 * 1024) / cold_s, 1),
+        "redownloaded_mb": round(max(0, served - payload) / (1024 * 1024), 1),
+        "cpu_s_per_gb": round(cpu_s / (payload / 1024**3), 2) if payload else 0,
+        "faults": {k: counters[k] for k in ("requests", "errors", "drops")},
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "-C", str(ROOT), "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True,
+        ).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(history_file):
+    records = []
+    try:
+        with open(history_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def regressions(result, history, threshold, window=5):
+    """Metrics more than threshold worse than the median of comparable runs"""
+    key = (result["scenario"], result["manifest"], json.dumps(result["params"], sort_keys=True))
+    earlier = [
+        r for r in history
+        if r.get("ok") and (r["scenario"], r["manifest"], json.dumps(r["params"], sort_keys=True)) == key
+    ][-window:]
+    if not earlier:
+        return []
+    found = []
+    for metric in ("cold_s", "cpu_s_per_gb"):
+        baseline = statistics.median(r[metric] for r in earlier)
+        if baseline and result[metric] > baseline * (1 + threshold):
+            found.append(f"{metric} {result[metric]:g} vs median {baseline:g} of {len(earlier)} runs")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark download_models.py against local fake upstreams",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--manifest", action="append", help="Manifest relative to the repo root (repeatable; default: all)"
+    )
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), help="Fault scenario (repeatable; default: all)"
+    )
+    parser.add_argument("--size-mb", type=int, default=32, help="Synthetic size of every model")
+    parser.add_argument("--seed", type=int, default=0, help="Fault RNG seed")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="KEY=VALUE",
+        help="Downloader environment setting under test, e.g. DOWNLOAD_PART_SIZE_MB=16",
+    )
+    parser.add_argument(
+        "--history", default=str(ROOT / "benchmarks" / "history.jsonl"), help="Where results accumulate"
+    )
+    parser.add_argument("--threshold", type=float, default=0.15, help="Regression tolerance (default: 0.15)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 on a regression")
+    parser.add_argument("--no-record", action="store_true", help="Compare without appending to the history")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show downloader output of failed runs")
+    args = parser.parse_args()
+
+    try:
+        args.settings = dict(item.split("=", 1) for item in args.set)
+    except ValueError:
+        parser.error("--set takes KEY=VALUE")
+    manifests = args.manifest or DEFAULT_MANIFESTS
+    scenarios = args.scenario or list(SCENARIOS)
+    history = load_history(args.history)
+    revision = git_revision()
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+    results, flagged = [], 0
+    for manifest in manifests:
+        if not parse_entries(ROOT / manifest):
+            print(f"{manifest:<45} no entries, skipped", file=sys.stderr)
+            continue
+        for scenario in scenarios:
+            result = run_scenario(scenario, manifest, args)
+            result.update(
+                time=timestamp,
+                commit=revision,
+                params={"size_mb": args.size_mb, "seed": args.seed, "settings": args.settings},
+            )
+            result["regressions"] = regressions(result, history, args.threshold)
+            flagged += bool(result["regressions"])
+            results.append(result)
+            if not args.json:
+                status = "ok" if result["ok"] else "FAILED"
+                print(
+                    f"{manifest:<45} {scenario:<8} {status:<6} cold {result['cold_s']:>7.2f}s "
+                    f"warm {result['warm_s']:>6.2f}s {result['throughput_mbps']:>7.1f} MB/s "
+                    f"re-dl {result['redownloaded_mb']:>6.1f} MB cpu {result['cpu_s_per_gb']:>6.2f} s/GB",
+                    flush=True,
+                )
+                for regression in result["regressions"]:
+                    print(f"    REGRESSION: {regression}", flush=True)
+
+    if not args.no_record:
+        Path(args.history).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, sort_keys=True) + "\n")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    failed = sum(not r["ok"] for r in results)
+    if failed:
+        return 1
+    return 1 if flagged and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Download + verify benchmark: two-pass vs hash-while-downloading
+
+Serves a random file from a local Range-capable HTTP server and measures
+the end-to-end time to get a verified model on disk:
+
+  two-pass (4 KB)  - download, then re-read with 4 KB reads (old verify_checksum)
+  two-pass (8 MB)  - download, then re-read with large buffers (hash_file)
+  fused            - SHA256 computed by the engine while writing
+
+Usage:
+  python benchmarks/bench_verify.py --size-mb 2048 --connections 16
+  python benchmarks/bench_verify.py --size-mb 512 --cold --json
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "base" / "scripts"))
+
+from download_models import SegmentedDownloader, hash_file  # noqa: E402
+from range_server import send_file_range, send_range_headers  # noqa: E402
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    root = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = os.path.join(self.root, self.path.lstrip("/"))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, "rb") as f:
+            byte_range = send_range_headers(self, os.path.getsize(path))
+            if byte_range:
+                send_file_range(self, f, *byte_range)
+
+
+def hash_4k(file_path):
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+def drop_from_page_cache(file_path):
+    # Best effort: makes the verify pass read from disk like a cold boot
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def run_case(name, url, target, expected, args, fused, verify):
+    engine = SegmentedDownloader(
+        part_size=args.part_size_mb * 1024 * 1024,
+        connections=args.connections,
+        hash_while_downloading=fused,
+    )
+    target.unlink(missing_ok=True)
+
+    started = time.perf_counter()
+    result = engine.download(url, target)
+    downloaded = time.perf_counter()
+    if args.cold and not fused:
+        drop_from_page_cache(target)
+    digest = result["sha256"] if fused else verify(target)
+    finished = time.perf_counter()
+
+    if digest != expected:
+        raise SystemExit(f"{name}: checksum mismatch")
+
+    return {
+        "case": name,
+        "download_s": round(downloaded - started, 3),
+        "verify_s": round(finished - downloaded, 3),
+        "total_s": round(finished - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size-mb", type=int, default=1024, help="Test file size")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--part-size-mb", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=3, help="Best of N per case")
+    parser.add_argument(
+        "--cold", action="store_true", help="Evict the file from page cache before verify"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = Path(tmp) / "serve"
+        serve_dir.mkdir()
+        source = serve_dir / "model.safetensors"
+        with open(source, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        expected = hash_file(source)
+
+        RangeHandler.root = str(serve_dir)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/model.safetensors"
+        target = Path(tmp) / "model.safetensors"
+
+        cases = [
+            ("two-pass (4 KB)", False, hash_4k),
+            ("two-pass (8 MB)", False, hash_file),
+            ("fused", True, None),
+        ]
+        results = []
+        for name, fused, verify in cases:
+            runs = [
+                run_case(name, url, target, expected, args, fused, verify)
+                for _ in range(args.rounds)
+            ]
+            results.append(min(runs, key=lambda r: r["total_s"]))
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps({"size_mb": args.size_mb, "results": results}, indent=2))
+        return 0
+
+    baseline = results[0]["total_s"]
+    print(f"{args.size_mb} MB, {args.connections} connections, best of {args.rounds}")
+    print(f"{'case':<18}{'download':>10}{'verify':>10}{'total':>10}{'speedup':>10}")
+    for r in results:
+        print(
+            f"{r['case']:<18}{r['download_s']:>9.2f}s{r['verify_s']:>9.2f}s"
+            f"{r['total_s']:>9.2f}s{baseline / r['total_s']:>9.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the model sources, with fault injection
+
+One HTTP server answers the way each upstream does, closely enough for
+download_models.py to take its real code paths:
+
+  HF       HEAD/GET /<repo>/resolve/main/<file>  302 to /blobs/<sha256> with
+                                                 X-Linked-Size/Etag/X-Repo-Commit
+  CivitAI  GET /api/v1/models/<id>               model JSON with sizeKB, SHA256
+                                                 and a downloadUrl
+           GET /api/v1/model-versions/<id>       the same files as one version,
+                                                 with modelId
+  R2/S3    HEAD/GET /<bucket>/<key>              path-style S3, x-amz-meta-sha256
+                                                 (signatures are not checked)
+  URL      HEAD/GET /url/<host>/<path>           plain Range-capable file
+
+Faults apply to every request and are drawn from a seeded RNG, so a
+scenario injects the same faults on every run:
+
+  latency_ms     delay before each response
+  rate_mbps      per-connection bandwidth cap for bodies
+  error_rate     fraction of requests answered 429 (Retry-After: 1) or 503
+  drop_rate      fraction of bodies cut off part way through
+
+Usage:
+  from fake_upstream import FakeUpstream
+  upstream = FakeUpstream(blobs_dir, faults={"drop_rate": 0.05})
+  upstream.add_huggingface("org/repo", "model.safetensors", size)
+"""
+
+import hashlib
+import http.server
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "base" / "scripts"))
+
+from range_server import send_range_headers  # noqa: E402
+
+CHUNK = 256 * 1024
+
+
+def make_blob(blobs_dir, name, size):
+    """Write `size` deterministic pseudo-random bytes; returns (path, sha256)"""
+    path = Path(blobs_dir) / hashlib.sha1(name.encode()).hexdigest()
+    rng = random.Random(name)
+    sha = hashlib.sha256()
+    # One random block repeated with a counter: cheap to make, no two
+    # blocks alike, so a misplaced Range shows up as a checksum mismatch
+    block = rng.randbytes(CHUNK)
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            data = (written.to_bytes(8, "little") + block)[: min(CHUNK, size - written)]
+            f.write(data)
+            sha.update(data)
+            written += len(data)
+    return path, sha.hexdigest()
+
+
+class FakeUpstream:
+    def __init__(self, blobs_dir, faults=None, seed=0, host="127.0.0.1", port=0):
+        self.blobs_dir = Path(blobs_dir)
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.faults = dict(faults or {})
+        self.blobs = {}
+        self.routes = {}
+        self.civitai_models = {}
+        self.civitai_versions = {}
+        self.counters = {"requests": 0, "body_bytes": 0, "errors": 0, "drops": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_port}"
+
+    # -- registry -------------------------------------------------------
+
+    def _blob(self, name, size):
+        path, digest = make_blob(self.blobs_dir, name, size)
+        self.blobs[digest] = path
+        return digest
+
+    def add_huggingface(self, repo, filename, size):
+        digest = self._blob(f"hf/{repo}/{filename}", size)
+        self.routes[f"/{repo}/resolve/main/{filename}"] = ("hf", digest)
+        return digest
+
+    def add_civitai(self, model_id, filename, size, version_id=None):
+        """Add a file to the model's only version, whose id defaults to the
+        model's so bare manifest ids resolve either way"""
+        self.civitai_versions[version_id or model_id] = model_id
+        digest = self._blob(f"civitai/{model_id}/{filename}", size)
+        self.routes[f"/civitai/download/{model_id}/{filename}"] = ("file", digest)
+        files = self.civitai_models.setdefault(model_id, [])
+        files.append(
+            {
+                "name": filename,
+                "sizeKB": size / 1024,
+                "primary": not files,
+                "hashes": {"SHA256": digest.upper()},
+                "downloadUrl": f"{self.url}/civitai/download/{model_id}/{filename}",
+            }
+        )
+        return digest
+
+    def add_s3(self, bucket, key, size):
+        digest = self._blob(f"s3/{bucket}/{key}", size)
+        self.routes[f"/{bucket}/{key}"] = ("s3", digest)
+        return digest
+
+    def add_url(self, url, size):
+        """Register url; returns (local url, sha256)"""
+        parsed = urlparse(url)
+        path = f"/url/{parsed.netloc}{parsed.path}"
+        digest = self._blob(f"url{path}", size)
+        self.routes[path] = ("file", digest)
+        return f"{self.url}{path}", digest
+
+    # -- faults ---------------------------------------------------------
+
+    def _roll(self, name):
+        rate = self.faults.get(name, 0)
+        if not rate:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    # -- server ---------------------------------------------------------
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _empty(self, code, headers=None):
+                self.send_response(code)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _faulted(self):
+                upstream._count(requests=1)
+                latency = upstream.faults.get("latency_ms", 0)
+                if latency:
+                    time.sleep(latency / 1000)
+                if upstream._roll("error_rate"):
+                    upstream._count(errors=1)
+                    with upstream._lock:
+                        throttled = upstream._rng.random() < 0.5
+                    if throttled:
+                        self._empty(429, {"Retry-After": "1"})
+                    else:
+                        self._empty(503)
+                    return True
+                return False
+
+            def do_HEAD(self):
+                self._dispatch(send_body=False)
+
+            def do_GET(self):
+                self._dispatch(send_body=True)
+
+            def _dispatch(self, send_body):
+                if self._faulted():
+                    return
+                path = unquote(urlparse(self.path).path)
+                match = re.match(r"^/api/v1/(models|model-versions)/([^/]+)$", path)
+                if match and send_body:
+                    kind, model_id = match.groups()
+                    if kind == "model-versions":
+                        version_id = model_id
+                        model_id = upstream.civitai_versions.get(version_id)
+                    else:
+                        version_id = next(
+                            (v for v, m in upstream.civitai_versions.items() if m == model_id), None
+                        )
+                    files = upstream.civitai_models.get(model_id)
+                    if files is None:
+                        self._empty(404)
+                        return
+                    version = {"id": version_id, "modelId": model_id, "name": "v1", "files": files}
+                    if kind == "model-versions":
+                        body = dict(version, model={"name": f"model {model_id}"})
+                    else:
+                        body = {"id": model_id, "modelVersions": [version]}
+                    body = json.dumps(body).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                if path.startswith("/blobs/"):
+                    digest = path[len("/blobs/"):]
+                    if digest in upstream.blobs:
+                        self._serve(digest, send_body)
+                    else:
+                        self._empty(404)
+                    return
+
+                kind, digest = upstream.routes.get(path, (None, None))
+                if kind == "hf":
+                    self._empty(
+                        302,
+                        {
+                            "Location": f"{upstream.url}/blobs/{digest}",
+                            "X-Linked-Size": str(os.path.getsize(upstream.blobs[digest])),
+                            "X-Linked-Etag": f'"{digest}"',
+                            "X-Repo-Commit": hashlib.sha1(path.encode()).hexdigest(),
+                        },
+                    )
+                elif kind:
+                    self._serve(digest, send_body, s3=kind == "s3")
+                else:
+                    self._empty(404)
+
+            def _serve(self, digest, send_body, s3=False):
+                path = upstream.blobs[digest]
+                headers = {"ETag": f'"{digest[:32]}"'}
+                if s3:
+                    headers["x-amz-meta-sha256"] = digest
+                byte_range = send_range_headers(self, os.path.getsize(path), headers)
+                if byte_range and send_body:
+                    self._body(path, *byte_range)
+
+            def _body(self, path, start, end):
+                length = end - start + 1
+                # A dropped connection stops somewhere in the body
+                cut = None
+                if length > 1 and upstream._roll("drop_rate"):
+                    with upstream._lock:
+                        cut = upstream._rng.randrange(1, length)
+                rate = upstream.faults.get("rate_mbps", 0) * 1024 * 1024
+                sent, started = 0, time.monotonic()
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    while sent < length:
+                        size = min(CHUNK, length - sent)
+                        if cut is not None:
+                            size = min(size, cut - sent)
+                        data = f.read(size)
+                        try:
+                            self.wfile.write(data)
+                        except OSError:
+                            break
+                        sent += len(data)
+                        upstream._count(body_bytes=len(data))
+                        if cut is not None and sent >= cut:
+                            upstream._count(drops=1)
+                            self.close_connection = True
+                            self.connection.shutdown(2)
+                            return
+                        if rate:
+                            ahead = sent / rate - (time.monotonic() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -25,26 +25,51 @@ error() {
 }
 
 # Validate manifests
+# VALIDATE_REMOTE=true also checks every model exists at its source
 validate_manifests() {
     log "🔍 Validating manifest files..."
     local errors=0
 
-    for manifest in manifests/*.txt templates/*/models_manifest.txt templates/*/nodes_manifest.txt; do
+    local python_cmd="python3"
+    if [ -f "/venv/bin/python" ]; then
+        python_cmd="/venv/bin/python"
+    fi
+
+    # All model manifests in one pass, so targets conflicting across them show up
+    local manifest_args=()
+    for manifest in manifests/*.txt templates/*/models_manifest.txt; do
         [ -f "$manifest" ] || continue
+        [[ "$manifest" == *_nodes.txt ]] && continue
+        manifest_args+=(--manifest "$manifest")
+    done
 
-        log "Checking $manifest..."
+    local remote_args=()
+    if [ "${VALIDATE_REMOTE:-false}" = "true" ]; then
+        remote_args+=(--remote)
+    fi
 
-        # Use Python script to validate
-        local python_cmd="python3"
-        if [ -f "/venv/bin/python" ]; then
-            python_cmd="/venv/bin/python"
+    if [ ${#manifest_args[@]} -gt 0 ]; then
+        if ! $python_cmd base/scripts/download_models.py "${manifest_args[@]}" --models-dir /tmp/validate \
+            --validate-only "${remote_args[@]}"; then
+            error "❌ Invalid model manifests"
+            ((errors++))
+        else
+            success "✅ Valid model manifests ($((${#manifest_args[@]} / 2)) files)"
         fi
+    fi
+
+    # Node manifests: repo_url|branch|category|description
+    for manifest in manifests/*_nodes.txt templates/*/nodes_manifest.txt; do
+        [ -f "$manifest" ] || continue
 
-        if ! $python_cmd base/scripts/download_models.py --manifest "$manifest" --models-dir /tmp/validate --validate-only 2>/dev/null; then
-            error "❌ Invalid manifest: $manifest"
+        local bad_lines
+        bad_lines=$(grep -nvE '^[[:space:]]*(#|$|(https?://|git@)[^|]+)' "$manifest" || true)
+        if [ -n "$bad_lines" ]; then
+            error "❌ Invalid node manifest: $manifest"
+            echo "$bad_lines"
             ((errors++))
         else
-            success "✅ Valid manifest: $manifest"
+            success "✅ Valid node manifest: $manifest"
         fi
     done
 